@@ -0,0 +1,216 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from emissions_store import FIELDNAMES
+
+# Benchmark harness: builds seeded synthetic datasets in the emissions_data.csv schema and
+# times every public operation on them, each in a fresh headless process.
+#   python benchmark.py --sizes 1000 5000 9999 --output bench_results.json
+#   python benchmark.py --sizes 1000 --compare bench_results.json
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Generated companies get the four-digit IDs 0001, 0002, ... like real ones, so a
+# dataset holds at most 9,999 of them: 0000 stays free for the add benchmark.
+FIRST_ID = 1
+NEW_ID = "0000"
+MAX_COMPANIES = 9999
+
+OPERATIONS = [
+    "index_build",
+    "store_emissions_data",
+    "retrieve_emissions_data_by_id",
+    "delete_emissions_data_by_id",
+    "retrieve_all_companies_data",
+    "generate_and_show_graph",
+    "render_distribution_charts",
+    "evaluate_scenarios",
+    "generate_and_save_graph_to_pdf",
+    "gui_cold_start",
+]
+
+def generate_dataset(path, companies, seed=0, chunk_size=100000):
+    """Write a synthetic emissions CSV with the given number of companies (at most MAX_COMPANIES)."""
+    import numpy as np
+    import pandas as pd
+
+    if not 0 < companies <= MAX_COMPANIES:
+        raise ValueError(f"Four-digit IDs allow 1 to {MAX_COMPANIES} companies, got {companies}")
+    rng = np.random.default_rng(seed)
+    with open(path, "w", newline="") as file:
+        file.write(",".join(FIELDNAMES) + "\r\n")
+        for start in range(0, companies, chunk_size):
+            count = min(chunk_size, companies - start)
+            ids = [f"{i:04d}" for i in range(FIRST_ID + start, FIRST_ID + start + count)]
+            # Annual emissions are skewed: most companies are small, a few are very large
+            values = rng.lognormal(mean=3.0, sigma=1.5, size=(count, len(FIELDNAMES) - 2)).round(3)
+            frame = pd.DataFrame(values, columns=FIELDNAMES[2:])
+            frame.insert(0, "Name", [f"Company {id_value}" for id_value in ids])
+            frame.insert(0, "ID", ids)
+            frame.to_csv(file, header=False, index=False, lineterminator="\r\n")
+
+def gui_cold_start():
+    """Import main and build the window as main.main() does; returns seconds since the import began."""
+    start = time.perf_counter()
+    import tkinter as tk
+    import main
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        # Headless: only the import part of the startup can be measured
+        print("gui_cold_start: no display, measured the import of main only", file=sys.stderr)
+        return time.perf_counter() - start
+    main.EmissionsDataApp(root)
+    root.update()
+    seconds = time.perf_counter() - start
+    root.destroy()
+    return seconds
+
+def run_operation(operation, companies):
+    """Run one operation in the current directory and return its wall time in seconds."""
+    if operation == "gui_cold_start":
+        # Before anything else is imported, as in a fresh start of main.py
+        return gui_cold_start()
+    import core
+
+    middle_id = f"{FIRST_ID + companies // 2:04d}"
+    start = time.perf_counter()
+    if operation == "index_build":
+        from emissions_store import get_store
+        get_store(core.CSV_FILENAME)
+    elif operation == "store_emissions_data":
+        data = {"ID": NEW_ID, "Name": "Benchmark Ltd"}
+        data.update({field: "12.5" for field in core.TRANSPORTATION_FIELDS + core.ENERGY_FIELDS})
+        core.add_company(data)
+    elif operation == "retrieve_emissions_data_by_id":
+        core.get_company(middle_id)
+    elif operation == "delete_emissions_data_by_id":
+        core.delete_company(middle_id)
+    elif operation == "retrieve_all_companies_data":
+        import utils
+        utils.retrieve_all_companies_data()
+    elif operation == "generate_and_show_graph":
+        from graph_emission import generate_and_show_graph
+        generate_and_show_graph()
+    elif operation == "render_distribution_charts":
+        from graph_emission import render_chart
+        for mode in ("histogram", "heatmap", "breakdown"):
+            render_chart(mode)
+    elif operation == "evaluate_scenarios":
+        from scenarios import grid
+        # 1331 scenarios, their savings over all companies and the top 5 companies of each
+        core.evaluate_scenarios(grid([{"shift": "Car", "to": "Train", "share": 0.5},
+                                      {"shift": "Coal", "to": "Electricity", "share": 1.0},
+                                      {"reduce": "Fuel Oil", "share": 0.4}], 10), top_n=5)
+    elif operation == "generate_and_save_graph_to_pdf":
+        core.generate_reports()
+    else:
+        raise ValueError(f"Unknown operation: {operation}")
+    return time.perf_counter() - start
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_child(args, data_dir):
+    # Children start from this lean parent: Linux keeps the peak RSS across exec,
+    # so the parent itself never imports NumPy or pandas
+    env = dict(os.environ, MPLBACKEND="Agg", PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    return subprocess.run([sys.executable, os.path.abspath(__file__)] + args,
+                          cwd=data_dir, env=env, check=True, capture_output=True, text=True).stdout
+
+def measure(operation, companies, data_dir):
+    """Run an operation in a fresh process so timings and peak RSS are not shared."""
+    output = run_child(["--run-operation", operation, "--companies", str(companies)], data_dir)
+    result = json.loads(output.strip().splitlines()[-1])
+    result["rows_per_sec"] = round(companies / result["seconds"]) if result["seconds"] else None
+    return result
+
+def run_benchmarks(sizes, seed=0, operations=OPERATIONS):
+    results = []
+    for companies in sizes:
+        with tempfile.TemporaryDirectory(prefix="gogreen-bench-") as data_dir:
+            start = time.perf_counter()
+            run_child(["--generate", str(companies), "--seed", str(seed)], data_dir)
+            print(f"{companies} companies: dataset generated in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+            for operation in operations:
+                result = measure(operation, companies, data_dir)
+                results.append(result)
+                flag = ""
+                if operation == "gui_cold_start":
+                    from main import STARTUP_BUDGET
+                    flag = "  OVER BUDGET" if result["seconds"] > STARTUP_BUDGET else f"  (budget {STARTUP_BUDGET} s)"
+                print(f"  {operation:32s} {result['seconds']:9.4f} s  {result['peak_rss_mb']} MB{flag}", file=sys.stderr)
+    return results
+
+def compare(results, baseline):
+    """Print the time ratio of every result against a previous results file."""
+    previous = {(r["operation"], r["companies"]): r for r in baseline["results"]}
+    for result in results:
+        old = previous.get((result["operation"], result["companies"]))
+        if old and old["seconds"]:
+            ratio = result["seconds"] / old["seconds"]
+            flag = "  REGRESSION" if ratio > 1.25 else ""
+            print(f"{result['operation']:32s} {result['companies']:>10} {old['seconds']:9.4f} s -> {result['seconds']:9.4f} s  x{ratio:.2f}{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every emissions operation on synthetic datasets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, MAX_COMPANIES],
+                        help=f"numbers of companies (default: 1000 5000 {MAX_COMPANIES}; up to {MAX_COMPANIES})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="previous JSON results file to compare against")
+    parser.add_argument("--generate", type=int, metavar="COMPANIES",
+                        help="only write emissions_data.csv with this many companies to the current directory")
+    parser.add_argument("--run-operation", help=argparse.SUPPRESS)
+    parser.add_argument("--companies", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    for companies in args.sizes + ([args.generate] if args.generate else []):
+        if not 0 < companies <= MAX_COMPANIES:
+            parser.error(f"four-digit IDs allow 1 to {MAX_COMPANIES} companies, got {companies}")
+
+    if args.generate:
+        generate_dataset("emissions_data.csv", args.generate, args.seed)
+        return
+
+    if args.run_operation:
+        # Child process: run a single operation in the current directory
+        seconds = run_operation(args.run_operation, args.companies)
+        print(json.dumps({"operation": args.run_operation, "companies": args.companies,
+                          "seconds": round(seconds, 6), "peak_rss_mb": peak_rss_mb()}))
+        return
+
+    results = run_benchmarks(args.sizes, args.seed, args.operations)
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+if __name__ == "__main__":
+    main()
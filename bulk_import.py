@@ -0,0 +1,120 @@
+import argparse
+import csv
+import json
+from collections import namedtuple
+
+from emissions_store import get_store
+from core import TRANSPORTATION_FIELDS, ENERGY_FIELDS, validate_emissions_data, calculate_emissions
+
+INPUT_FIELDS = ["ID", "Name"] + TRANSPORTATION_FIELDS + ENERGY_FIELDS
+
+ImportResult = namedtuple("ImportResult", ["imported", "rejected", "rejected_filename"])
+
+def read_records(path):
+    """
+    Yield raw activity records from a CSV file (with a header row) or a JSONL
+    file (one JSON object per line), as (line number, record, error) tuples.
+    A JSONL line that is not a JSON object is yielded with an empty record and
+    the reason as error, so it is rejected like an invalid CSV row.
+    """
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_number, {}, f"Invalid JSON: {e}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_number, {}, "Each line must be a JSON object."
+                    continue
+                yield line_number, record, None
+    else:
+        with open(path, "r", newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield reader.line_num, record, None
+
+def normalize_record(record):
+    """Convert every known field to the string form the validators expect."""
+    data = {}
+    for field in INPUT_FIELDS:
+        value = record.get(field, "")
+        data[field] = "" if value is None else str(value).strip()
+    # Bicycle and Walking are not entered in the GUI either, they default to 0
+    for field in ("Bicycle", "Walking"):
+        if data[field] == "":
+            data[field] = "0"
+    return data
+
+def import_file(path, csv_filename="emissions_data.csv", rejected_filename=None, generate_reports=True):
+    """
+    Bulk import raw activity records into the emissions CSV file.
+
+    Every record goes through the same validation and annualization as the
+    "Add Data" tab (see core.validate_emissions_data and core.calculate_emissions),
+    but duplicate IDs are checked against an in-memory set, accepted rows are
+    written in one buffered pass and the PDF reports are regenerated only once.
+
+    Args:
+        path (str): CSV or JSONL file with ID, Name and raw monthly activity fields.
+        csv_filename (str): Emissions CSV file to append to.
+        rejected_filename (str, optional): Where to write rejected records with their
+            error. Defaults to '<path>.rejected.csv'; only created if something is rejected.
+        generate_reports (bool): Regenerate the PDF reports after the import.
+
+    Returns:
+        ImportResult: Number of imported and rejected records and the rejected-rows file.
+    """
+    if rejected_filename is None:
+        rejected_filename = path + ".rejected.csv"
+    store = get_store(csv_filename)
+    existing_ids = store.ids()
+    rejected = {"count": 0, "file": None, "writer": None}
+
+    def reject(line_number, data, error):
+        if rejected["writer"] is None:
+            rejected["file"] = open(rejected_filename, "w", newline="", encoding="utf-8")
+            rejected["writer"] = csv.DictWriter(rejected["file"], fieldnames=["Line", "Error"] + INPUT_FIELDS)
+            rejected["writer"].writeheader()
+        rejected["writer"].writerow({"Line": line_number, "Error": error, **data})
+        rejected["count"] += 1
+
+    def accepted_rows():
+        for line_number, record, error in read_records(path):
+            data = normalize_record(record)
+            error = error or validate_emissions_data(data, existing_ids)
+            if error:
+                reject(line_number, data, error)
+                continue
+            existing_ids.add(data["ID"])
+            yield calculate_emissions(data)
+
+    try:
+        imported = store.append_many(accepted_rows())
+    finally:
+        if rejected["file"] is not None:
+            rejected["file"].close()
+
+    if generate_reports and imported:
+        from pdf_report import generate_and_save_graph_to_pdf
+        generate_and_save_graph_to_pdf('reports/emissions_report.pdf')
+
+    return ImportResult(imported, rejected["count"], rejected_filename if rejected["count"] else None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import raw activity data (CSV or JSONL) into the emissions data.")
+    parser.add_argument("path", help="CSV or JSONL file with ID, Name and monthly activity fields")
+    parser.add_argument("--rejected", help="file for rejected records (default: <path>.rejected.csv)")
+    parser.add_argument("--no-reports", action="store_true", help="do not regenerate the PDF reports")
+    args = parser.parse_args()
+
+    result = import_file(args.path, rejected_filename=args.rejected, generate_reports=not args.no_reports)
+    print(f"Imported {result.imported} records, rejected {result.rejected}.")
+    if result.rejected_filename:
+        print(f"Rejected records written to {result.rejected_filename}")
+
+if __name__ == "__main__":
+    main()
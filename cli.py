@@ -0,0 +1,251 @@
+import argparse
+import json
+import sys
+
+import core
+from core import EmissionsError, TRANSPORTATION_FIELDS, ENERGY_FIELDS
+from timeseries import format_aggregates
+
+# Headless command line for the emissions data, e.g.:
+#   python -m cli get 1234
+#   python -m cli add 4321 "Acme Ltd" --car 120 --electricity 900
+#   python -m cli top 5 --json
+#   python -m cli scenario --shift Car Train 30 --reduce "Fuel Oil" 20 --top 3
+
+def field_option(field):
+    return "--" + field.lower().replace(" ", "-")
+
+def cmd_add(args):
+    data = {"ID": args.id, "Name": args.name}
+    for field in TRANSPORTATION_FIELDS + ENERGY_FIELDS:
+        data[field] = getattr(args, field.lower().replace(" ", "_"))
+    row = core.add_company(data)
+    if args.report:
+        core.generate_reports()
+    return row, f"Added company {row['ID']} ({row['Name']})."
+
+def cmd_record(args):
+    data = {"ID": args.id, "Month": args.month}
+    for field in TRANSPORTATION_FIELDS + ENERGY_FIELDS:
+        data[field] = getattr(args, field.lower().replace(" ", "_"))
+    aggregates = core.add_monthly_record(data)
+    return aggregates, "\n".join([f"Recorded {args.month} for company {args.id}."] + format_aggregates(aggregates))
+
+def cmd_get(args):
+    company = core.get_company(args.id)
+    lines = [f"{key}: {value}" for key, value in company["row"].items()]
+    lines += [f"Total Transportation Emissions: {company['total_transportation_emissions']} kg CO2",
+              f"Total Energy Source Emissions: {company['total_energy_emissions']} kg CO2",
+              f"Total Emissions: {company['total_emissions']} kg CO2",
+              company["suggestions"]]
+    if company["time_series"]:
+        lines += format_aggregates(company["time_series"])
+    return company, "\n".join(lines)
+
+def cmd_delete(args):
+    core.delete_company(args.id)
+    return {"deleted": args.id}, f"Deleted company {args.id}."
+
+def cmd_list(args):
+    companies = core.list_companies(args.offset, args.limit)
+    return [{"ID": company_id, "Name": name} for company_id, name in companies], \
+        "\n".join(f"{company_id}  {name}" for company_id, name in companies)
+
+def cmd_search(args):
+    companies = core.search_companies(args.query, args.limit)
+    return [{"ID": company_id, "Name": name} for company_id, name in companies], \
+        "\n".join(f"{company_id}  {name}" for company_id, name in companies)
+
+def cmd_top(args):
+    companies = core.top_companies(args.n)
+    return companies, "\n".join(f"{rank}. {c['ID']}  {c['Name']}  {c['total_emissions']:.2f} kg CO2"
+                                for rank, c in enumerate(companies, start=1))
+
+def cmd_rank(args):
+    rank = core.company_rank(args.id)
+    return {"ID": args.id, **rank}, f"Company {args.id} ranks {rank['rank']} of {rank['companies']} by total emissions."
+
+def print_progress(done, total):
+    print(f"\rRendering reports: {done}/{total} tasks", end="\n" if done == total else "", file=sys.stderr, flush=True)
+
+def cmd_report(args):
+    filenames = core.generate_reports(args.top, parallel=args.parallel, statements=args.statements,
+                                      workers=args.workers, progress=print_progress,
+                                      pages_per_volume=args.pages_per_volume)
+    return filenames, "\n".join(filenames)
+
+def cmd_export(args):
+    count = core.export_data(args.path, args.columns)
+    return {"exported": count}, f"Exported {count} companies to {args.path}."
+
+def cmd_import(args):
+    result = core.import_data(args.path)
+    return result, f"Imported {result['imported']} companies, skipped {result['skipped']}."
+
+def cmd_chart(args):
+    filename = core.render_chart(args.mode, args.output or f"{args.mode}.png")
+    return filename, filename
+
+def cmd_scenario(args):
+    from scenarios import DEFAULT_SCENARIOS, format_savings, grid
+
+    if args.file:
+        try:
+            with open(args.file, "r", encoding="utf-8") as file:
+                scenarios = json.load(file)
+        except (OSError, ValueError) as e:
+            raise EmissionsError(f"Cannot read scenarios from {args.file}: {e}")
+    else:
+        strategies = [{"shift": source, "to": target, "share": float(percent) / 100}
+                      for source, target, percent in args.shift or []]
+        strategies += [{"reduce": field, "share": float(percent) / 100} for field, percent in args.reduce or []]
+        if not strategies:
+            scenarios = DEFAULT_SCENARIOS
+        elif args.steps:
+            scenarios = grid(strategies, args.steps)
+        else:
+            scenarios = [{"name": "Scenario", "strategies": strategies}]
+    result = core.evaluate_scenarios(scenarios, args.company, args.top)
+    # Best scenarios first; a sweep of thousands prints only the first --limit
+    ranked = sorted(result["scenarios"], key=lambda entry: -entry["savings"])[:args.limit]
+    lines = [f"All companies: {result['baseline']:.2f} kg CO2"]
+    for entry in ranked:
+        line = f"{entry['name']}: {format_savings(entry['savings'], entry['percent'])}"
+        if "company" in entry:
+            line += f", company {args.company} {format_savings(entry['company'], entry['company_percent'])}"
+        lines.append(line)
+        lines += [f"  {c['ID']}  {c['Name']}  {c['savings']:.2f} kg CO2" for c in entry.get("top", [])]
+    return {"baseline": result["baseline"], "scenarios": ranked}, "\n".join(lines)
+
+def cmd_prune(args):
+    deleted = core.prune_reports(args.keep_last, args.max_age_days, args.include_migrated)
+    return {"deleted": deleted}, f"Deleted {deleted} old report runs."
+
+def cmd_factors(args):
+    if args.set:
+        factors = {}
+        for assignment in args.set:
+            field, _, value = assignment.partition("=")
+            factors[field] = value
+        version = core.add_factor_version(factors)
+        print(f"Added emission factor version {version}.", file=sys.stderr)
+    table = core.factor_versions()
+    lines = []
+    for version, factors in table["versions"].items():
+        marker = " (current)" if version == table["current"] else ""
+        lines.append(f"Version {version}{marker}: " + ", ".join(f"{field}={factor}" for field, factor in factors.items()))
+    return table, "\n".join(lines)
+
+def cmd_recompute(args):
+    result = core.recompute_emissions(args.version)
+    return result, f"Recomputed {result['rows']} rows with factor version {result['version']}."
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Manage emissions data without the GUI.")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add a company from monthly activity values")
+    add.add_argument("id")
+    add.add_argument("name")
+    for field in TRANSPORTATION_FIELDS + ENERGY_FIELDS:
+        add.add_argument(field_option(field), default="0", help=f"monthly {field} value (default 0)")
+    add.add_argument("--report", action="store_true", help="regenerate the PDF reports afterwards")
+    add.set_defaults(func=cmd_add)
+
+    record = commands.add_parser("record", help="record one month of activity for an existing company")
+    record.add_argument("id")
+    record.add_argument("month", help="YYYY-MM")
+    for field in TRANSPORTATION_FIELDS + ENERGY_FIELDS:
+        record.add_argument(field_option(field), default="0", help=f"{field} value of the month (default 0)")
+    record.set_defaults(func=cmd_record)
+
+    get = commands.add_parser("get", help="show one company and its summary")
+    get.add_argument("id")
+    get.set_defaults(func=cmd_get)
+
+    delete = commands.add_parser("delete", help="delete one company")
+    delete.add_argument("id")
+    delete.set_defaults(func=cmd_delete)
+
+    listing = commands.add_parser("list", help="list companies ordered by name")
+    listing.add_argument("--offset", type=int, default=0)
+    listing.add_argument("--limit", type=int)
+    listing.set_defaults(func=cmd_list)
+
+    search = commands.add_parser("search", help="find companies by name (prefix, then fuzzy matches)")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=10)
+    search.set_defaults(func=cmd_search)
+
+    top = commands.add_parser("top", help="companies with the highest total emissions")
+    top.add_argument("n", type=int, nargs="?", default=10)
+    top.set_defaults(func=cmd_top)
+
+    rank = commands.add_parser("rank", help="rank of one company by total emissions")
+    rank.add_argument("id")
+    rank.set_defaults(func=cmd_rank)
+
+    report = commands.add_parser("report", help="generate the graph and data PDF reports")
+    report.add_argument("--top", type=int, default=10, help="companies in the graph (default 10)")
+    report.add_argument("--parallel", action="store_true", help="render the reports in a pool of worker processes")
+    report.add_argument("--statements", action="store_true", help="also write one statement PDF per company (implies --parallel)")
+    report.add_argument("--workers", type=int, help="worker processes (default: number of CPUs)")
+    report.add_argument("--pages-per-volume", type=int, help="split the data report into files of this many pages")
+    report.set_defaults(func=cmd_report)
+
+    export = commands.add_parser("export", help="export the companies to a Parquet or Arrow file (needs pyarrow)")
+    export.add_argument("path", help="output file: .parquet, .arrow or .feather")
+    export.add_argument("--columns", nargs="+", help="columns to export (default: all)")
+    export.set_defaults(func=cmd_export)
+
+    importing = commands.add_parser("import", help="add the companies of an exported Parquet or Arrow file")
+    importing.add_argument("path")
+    importing.set_defaults(func=cmd_import)
+
+    chart = commands.add_parser("chart", help="render a chart of all companies to an image file")
+    chart.add_argument("mode", help="top, histogram, heatmap or breakdown")
+    chart.add_argument("--output", help="image file, its extension picks the format (default MODE.png)")
+    chart.set_defaults(func=cmd_chart)
+
+    scenario = commands.add_parser("scenario", help="project the savings of what-if interventions on every company")
+    scenario.add_argument("--shift", nargs=3, action="append", metavar=("FROM", "TO", "PERCENT"),
+                          help='move a share of one activity to another, e.g. --shift Car Train 30')
+    scenario.add_argument("--reduce", nargs=2, action="append", metavar=("FIELD", "PERCENT"),
+                          help='cut an activity, e.g. --reduce "Fuel Oil" 20')
+    scenario.add_argument("--steps", type=int, help="evaluate every combination of the strategies at STEPS + 1 shares up to the given ones")
+    scenario.add_argument("--file", help="JSON list of scenarios ({name, strategies}) to evaluate instead")
+    scenario.add_argument("--company", help="also show the savings of this company")
+    scenario.add_argument("--top", type=int, default=0, help="also list the companies saving most under each scenario")
+    scenario.add_argument("--limit", type=int, default=20, help="scenarios shown, best first (default 20)")
+    scenario.set_defaults(func=cmd_scenario)
+
+    prune = commands.add_parser("prune", help="delete old reports outside the retention policy")
+    prune.add_argument("--keep-last", type=int, help="report runs to keep (default GOGREEN_REPORTS_KEEP_LAST or 20, 0 = all)")
+    prune.add_argument("--max-age-days", type=float, help="delete runs unused for this many days (default GOGREEN_REPORTS_MAX_AGE_DAYS, 0 = never)")
+    prune.add_argument("--include-migrated", action="store_true",
+                       help="also prune the reports that predate the report cache (kept by default)")
+    prune.set_defaults(func=cmd_prune)
+
+    factors = commands.add_parser("factors", help="show the emission factor versions")
+    factors.add_argument("--set", nargs="+", metavar="FIELD=FACTOR",
+                         help='add a new current version with these factors changed, e.g. --set "Natural Gas=0.0055"')
+    factors.set_defaults(func=cmd_factors)
+
+    recompute = commands.add_parser("recompute", help="recompute all emissions from the stored raw activity")
+    recompute.add_argument("--version", type=int, help="factor version to use (default: current)")
+    recompute.set_defaults(func=cmd_recompute)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        result, text = args.func(args)
+    except EmissionsError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2) if args.json else text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
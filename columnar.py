@@ -0,0 +1,215 @@
+import json
+import os
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only columnar import/export and snapshots need pyarrow
+    pa = None
+
+from emissions_store import FIELDNAMES, get_store
+from records import Records
+
+# Columnar (Parquet / Arrow IPC) copies of the emissions table. Arrow IPC files,
+# also known as Feather v2, are written uncompressed so they can be memory-mapped
+# and read without a copy; only the columns asked for are ever paged in.
+
+FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+# Rows written per batch when an imported table is appended to the store
+IMPORT_BATCH_ROWS = 10000
+# Layout of the Records files written by write_records
+RECORDS_FORMAT = "records-1"
+
+
+def available():
+    """True if pyarrow is installed."""
+    return pa is not None
+
+
+def file_format(path):
+    """Return "parquet" or "arrow" for a columnar file name, by its extension."""
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unknown columnar file type: {path} (use {', '.join(FORMATS)})")
+    return fmt
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet and Arrow files need pyarrow (pip install pyarrow).")
+
+
+def write_table(path, frame, metadata=None):
+    """
+    Write a DataFrame to a Parquet or Arrow file, with optional string metadata.
+
+    The file is written under a temporary name and renamed, so readers never
+    see a partial file.
+    """
+    _require_pyarrow()
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               **{key: str(value) for key, value in metadata.items()}})
+    temp_path = path + ".tmp"
+    if file_format(path) == "parquet":
+        pq.write_table(table, temp_path)
+    else:
+        feather.write_feather(table, temp_path, compression="uncompressed")
+    os.replace(temp_path, path)
+
+
+def read_table(path, columns=None):
+    """
+    Read the given columns (default: all) of a Parquet or Arrow file as a
+    pyarrow Table. The file is memory-mapped, so for Arrow files the columns
+    are views of the page cache and unselected columns are never read.
+    """
+    _require_pyarrow()
+    if file_format(path) == "parquet":
+        return pq.read_table(path, columns=columns, memory_map=True)
+    return feather.read_table(path, columns=columns, memory_map=True)
+
+
+def read_frame(path, columns=None):
+    """Read the given columns of a Parquet or Arrow file as a DataFrame."""
+    return read_table(path, columns).to_pandas(split_blocks=True)
+
+
+def read_metadata(path):
+    """Return the string metadata stored with a Parquet or Arrow file."""
+    _require_pyarrow()
+    if file_format(path) == "parquet":
+        schema = pq.read_schema(path, memory_map=True)
+    else:
+        with pa.memory_map(path) as source:
+            schema = pa.ipc.open_file(source).schema
+    return {key.decode(): value.decode() for key, value in (schema.metadata or {}).items()}
+
+
+def write_records(path, records, fields, columns, metadata=None):
+    """
+    Write Records to an Arrow file as they are held in memory: the packed IDs,
+    the name pool as one large_string column and one column per field. The
+    CSV column order and the IDs that do not pack are kept in the metadata.
+    """
+    _require_pyarrow()
+    offsets = records.name_offsets
+    names = pa.LargeStringArray.from_buffers(len(records), pa.py_buffer(np.ascontiguousarray(offsets)),
+                                             pa.py_buffer(records.name_pool))
+    table = pa.table({"ID": pa.array(records.ids), "Name": names,
+                      **{field: pa.array(records.values[:, position]) for position, field in enumerate(fields)}})
+    metadata = {**(metadata or {}), "format": RECORDS_FORMAT, "columns": json.dumps(columns),
+                "odd_ids": json.dumps(records.odd_ids)}
+    table = table.replace_schema_metadata({key: str(value) for key, value in metadata.items()})
+    temp_path = path + ".tmp"
+    feather.write_feather(table, temp_path, compression="uncompressed")
+    os.replace(temp_path, path)
+
+
+def read_records(path, fields):
+    """
+    Read Records written by write_records and the CSV column order stored with
+    them. The file is memory-mapped; each column is copied out once, so the
+    records do not keep the file open.
+    """
+    _require_pyarrow()
+    metadata = read_metadata(path)
+    if metadata.get("format") != RECORDS_FORMAT:
+        raise ValueError(f"{path} does not hold records")
+    table = feather.read_table(path, memory_map=True)
+    ids = np.array(table["ID"].to_numpy())
+    names = table["Name"].combine_chunks()
+    _, offset_buffer, pool_buffer = names.buffers()
+    offsets = np.frombuffer(offset_buffer, dtype=np.int64, count=len(names) + 1, offset=names.offset * 8)
+    pool = pool_buffer.to_pybytes()[offsets[0]:offsets[-1]] if pool_buffer is not None else b""
+    values = np.column_stack([table[field].to_numpy() for field in fields]) if len(ids) else np.empty((0, len(fields)))
+    odd_ids = {int(row): id_value for row, id_value in json.loads(metadata["odd_ids"]).items()}
+    return Records(ids, values, pool, offsets - offsets[0], odd_ids), json.loads(metadata["columns"])
+
+
+def export_table(path, csv_filename="emissions_data.csv", columns=None):
+    """
+    Export the stored companies (deleted ones left out) to a Parquet or Arrow file.
+
+    Args:
+        path (str): Output file; its extension picks the format (see FORMATS).
+        columns (list, optional): Columns to write, default all of FIELDNAMES.
+
+    Returns:
+        int: Number of companies exported.
+    """
+    from emissions_dataset import get_dataset
+
+    columns = list(columns or FIELDNAMES)
+    unknown = [column for column in columns if column not in FIELDNAMES]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    file_format(path)
+    dataset = get_dataset(csv_filename)
+    with dataset.lock:
+        frame = dataset.frame[columns]
+    write_table(path, frame)
+    return len(frame)
+
+
+def import_table(path, csv_filename="emissions_data.csv"):
+    """
+    Append the companies of a Parquet or Arrow file written by export_table.
+
+    The file holds emissions (kg CO2), not raw activity, so rows are stored
+    as they are. Rows with an invalid or already stored ID, an invalid name or
+    an emission value that is not a non-negative number are skipped.
+
+    Returns:
+        tuple: Number of (imported, skipped) rows.
+    """
+    from core import is_valid_company_name, is_valid_id
+
+    table = read_table(path)
+    missing = [column for column in FIELDNAMES if column not in table.column_names]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    store = get_store(csv_filename)
+    stored_ids = store.ids()
+    skipped = 0
+
+    def rows():
+        nonlocal skipped
+        for batch in table.select(FIELDNAMES).to_batches(IMPORT_BATCH_ROWS):
+            for record in batch.to_pylist():
+                id_value = "" if record["ID"] is None else str(record["ID"])
+                row = _import_row(record)
+                if (row is None or not is_valid_id(id_value) or id_value in stored_ids
+                        or not is_valid_company_name(record["Name"])):
+                    skipped += 1
+                    continue
+                stored_ids.add(id_value)
+                row["ID"] = id_value
+                yield row
+
+    imported = store.append_many(rows())
+    return imported, skipped
+
+
+def _import_row(record):
+    # The emission values of an imported record, or None if one is not a non-negative number
+    row = {"Name": record["Name"]}
+    for field in FIELDNAMES[2:]:
+        value = record[field]
+        # Empty cells come back as None (or NaN from pandas) and are stored empty again
+        if value is None or value != value:
+            row[field] = ""
+            continue
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= number < float("inf"):
+            return None
+        row[field] = number
+    return row
@@ -0,0 +1,467 @@
+"""
+UI-agnostic core API for the emissions data.
+
+Every function returns plain Python data and reports problems by raising
+EmissionsError with a message fit for the user, so the same logic backs the
+Tk GUI (utils), the command line (cli) and scripts. Heavy modules (pandas,
+NumPy, matplotlib, ReportLab) are imported only by the functions that need
+them, so an ID lookup does not pay for them.
+"""
+import os
+import re
+from emissions_store import get_store
+from emission_factors import MONTHS_PER_YEAR, current_factor_version, get_factors, load_factor_table
+from emission_factors import add_factor_version as new_factor_version
+from instrumentation import timed
+
+CSV_FILENAME = "emissions_data.csv"
+REPORT_FILENAME = "reports/emissions_report.pdf"
+
+class EmissionsError(Exception):
+    """A user-facing error from one of the core operations."""
+
+class CompanyNotFound(EmissionsError):
+    """The requested company ID is not stored."""
+
+def is_valid_id(id_value):
+    """Check if the ID is exactly four digits."""
+    return re.match(r"^\d{4}$", id_value) is not None
+
+def is_new_id(id_value, csv_filename):
+    """Check if the ID is new or exists in the given CSV file."""
+    # Indexed lookup instead of scanning every row of the CSV file
+    return not get_store(csv_filename).exists(id_value)
+
+def is_valid_company_name(name):
+    """Check if the company name is valid. Adjust the criteria as needed."""
+    # Example validation: Non-empty and up to 100 characters. Adjust as needed.
+    # A line break would split the row across lines of the CSV file, so none is allowed
+    return isinstance(name, str) and 0 < len(name) <= 100 and "\n" not in name and "\r" not in name
+
+def is_valid_transport_value(value):
+    """Check if the transport value is a decimal or integer."""
+    # Assuming transport values can be integers or decimals with optional 3 decimal places
+    return re.match(r"^\d+(\.\d{1,3})?$", value) is not None
+
+def is_valid_energy_value(value):
+    """Check if the energy value is a decimal or integer up to 6 digits and 3 decimal places."""
+    return re.match(r"^\d{1,6}(\.\d{1,3})?$", value) is not None
+
+def is_valid_month(month):
+    """Check if the month is given as YYYY-MM."""
+    return re.match(r"^\d{4}-(0[1-9]|1[0-2])$", month) is not None
+
+TRANSPORTATION_FIELDS = ["Car", "Bus", "Train", "Bicycle", "Walking"]
+ENERGY_FIELDS = ["Electricity", "Natural Gas", "Fuel Oil", "Propane", "Coal"]
+
+@timed()
+def validate_emissions_data(data, existing_ids=None):
+    """
+    Validate raw emissions input.
+
+    Args:
+        data (dict): Dictionary containing company's raw emissions data.
+        existing_ids (set, optional): IDs already stored. When omitted, the ID index
+            of 'emissions_data.csv' is queried instead.
+
+    Returns:
+        str: Error message for the first failed validation, or None if the data is valid.
+    """
+    # Validation for the ID
+    if not is_valid_id(data.get("ID", "")):
+        return "ID must be exactly four digits."
+
+    # Validation for new ID
+    if existing_ids is not None:
+        if data["ID"] in existing_ids:
+            return "ID exists in the database. Please enter a new ID."
+    elif not is_new_id(data.get("ID", ""), CSV_FILENAME):
+        return "ID exists in the database. Please enter a new ID."
+
+    # Validate company name
+    if not is_valid_company_name(data.get("Name", "")):
+        return "Invalid company name. Ensure it is not empty, is on a single line and does not exceed 100 characters."
+
+    return validate_activity_values(data)
+
+def validate_activity_values(data):
+    """Return an error message for the first invalid activity value in data, or None."""
+    # Validate transportation fields
+    for field in TRANSPORTATION_FIELDS:
+        if not is_valid_transport_value(str(data.get(field, ""))):
+            return f"Invalid value for {field}. Must be a decimal or integer."
+
+    # Validation for energy fields
+    for field in ENERGY_FIELDS:
+        if not is_valid_energy_value(str(data.get(field, ""))):
+            return f"{field} must be a decimal or integer up to 6 digits and 3 decimal places. No alphabetic characters allowed."
+
+    return None
+
+def calculate_emissions(data):
+    """
+    Annualize validated raw input into the emissions row stored in the CSV file.
+
+    The raw monthly values and the factor version used are kept in the row as
+    "activity" and "factor_version", so the store can save them for recomputation.
+    """
+    version = current_factor_version()
+    factors = get_factors(version)
+    activity = {field: float(data.get(field, 0)) for field in TRANSPORTATION_FIELDS + ENERGY_FIELDS}
+    # Calculate emissions for all energy fields
+    emissions_data = {"ID": data["ID"], "Name": data["Name"]}
+    for field in ENERGY_FIELDS:
+        emissions_data[field] = activity[field] * MONTHS_PER_YEAR * factors[field]
+
+    # Calculate emissions for transportation fields
+    for field in TRANSPORTATION_FIELDS:
+        emissions_data[field] = activity[field] * MONTHS_PER_YEAR * factors[field]
+    emissions_data["activity"] = activity
+    emissions_data["factor_version"] = version
+    return emissions_data
+
+def get_conversion_factor(field, version=None):
+    """Get the conversion factor for calculating emissions based on the field."""
+    # Factors come from the versioned table in emission_factors.json, loaded once
+    return get_factors(version).get(field, 1.0)  # Default to 1.0 if no conversion factor is defined
+
+
+@timed()
+def add_monthly_record(data):
+    """
+    Record one month of raw activity for an existing company (time-series mode).
+
+    Args:
+        data (dict): ID, Month ('YYYY-MM') and the monthly activity fields.
+
+    Returns:
+        dict: The company's updated rolling 12-month, year-to-date and
+            year-over-year aggregates (see timeseries.compute_aggregates).
+    """
+    from timeseries import get_timeseries
+
+    if not is_valid_id(data.get("ID", "")):
+        raise EmissionsError("ID must be exactly four digits.")
+    if is_new_id(data["ID"], CSV_FILENAME):
+        raise CompanyNotFound("Company ID not found.")
+    if not is_valid_month(data.get("Month", "")):
+        raise EmissionsError("Month must be given as YYYY-MM.")
+    error = validate_activity_values(data)
+    if error:
+        raise EmissionsError(error)
+
+    version = current_factor_version()
+    factors = get_factors(version)
+    activity = {field: float(data[field]) for field in TRANSPORTATION_FIELDS + ENERGY_FIELDS}
+    # Emissions of this one month: not annualized
+    emissions = {field: value * factors[field] for field, value in activity.items()}
+    try:
+        return get_timeseries().add(data["ID"], data["Month"], activity, version, emissions)
+    except ValueError as e:
+        raise EmissionsError(str(e))
+
+@timed()
+def add_company(data):
+    """
+    Validate raw monthly input, annualize it and store it.
+
+    Returns:
+        dict: The emissions row that was stored.
+    """
+    error = validate_emissions_data(data)
+    if error:
+        raise EmissionsError(error)
+    emissions_data = calculate_emissions(data)
+    # Write the calculated emissions to the CSV file (columns in the file's order); the ID
+    # is checked again when written, in case another process added it in the meantime
+    if not get_store(CSV_FILENAME).insert(emissions_data):
+        raise EmissionsError("ID exists in the database. Please enter a new ID.")
+    return emissions_data
+
+def parse_company_id(company_id):
+    """Return the stored form of a company ID given as text or integer."""
+    try:
+        # Convert company_id to integer
+        return f"{int(company_id):04d}"
+    except (TypeError, ValueError):
+        raise EmissionsError("Invalid company ID. Please enter a valid integer.")
+
+def summarize_emissions(row):
+    """Return the totals and reduction suggestion for a stored emissions row."""
+    total_transportation_emissions = sum(float(row[method]) for method in TRANSPORTATION_FIELDS)
+    total_energy_emissions = sum(float(row[source]) for source in ENERGY_FIELDS)
+    total_emissions = total_transportation_emissions + total_energy_emissions
+
+    # Suggestions
+    if total_emissions < 75:
+        suggestions = "- Your company's emissions are relatively low. Keep going!"
+    elif total_emissions > 75:
+        suggestions = "- Consider implementing measures to reduce your carbon footprint,(using public transportation, carpooling, or investing in energy-efficient appliances."
+    else:
+        suggestions = "- Your company's emissions are moderate. you must evaluate your measurs regularly"
+    return {
+        "total_transportation_emissions": total_transportation_emissions,
+        "total_energy_emissions": total_energy_emissions,
+        "total_emissions": total_emissions,
+        "suggestions": suggestions,
+    }
+
+@timed()
+def get_company(company_id):
+    """
+    Look up one company through the ID index.
+
+    Returns:
+        dict: ``row`` (the stored values as strings) plus the fields of summarize_emissions,
+            and ``time_series``: the company's monthly aggregates, or None without readings.
+    """
+    from timeseries import get_timeseries
+
+    company_id = parse_company_id(company_id)
+    row = get_store(CSV_FILENAME).get(company_id)
+    if row is None:
+        raise CompanyNotFound("Company ID not found.")
+    return {"row": row, **summarize_emissions(row), "time_series": get_timeseries().aggregates(company_id)}
+
+@timed()
+def delete_company(company_id):
+    """Delete a company's emissions data."""
+    from timeseries import get_timeseries
+
+    company_id = parse_company_id(company_id)
+    if not get_store(CSV_FILENAME).delete(company_id):
+        raise CompanyNotFound("Company ID not found.")
+    get_timeseries().delete(company_id)
+
+@timed()
+def count_companies():
+    """Return the number of companies in the CSV file."""
+    from emissions_dataset import get_dataset
+
+    return len(get_dataset(CSV_FILENAME))
+
+@timed()
+def list_companies(offset=0, limit=None):
+    """
+    Return companies ordered alphabetically by name as (ID, Name) tuples.
+
+    Args:
+        offset (int): Position of the first company to return in the sorted order.
+        limit (int, optional): Maximum number of companies to return; all remaining if omitted.
+
+    Returns:
+        list: (ID, Name) tuples of strings.
+    """
+    from emissions_dataset import get_dataset
+
+    dataset = get_dataset(CSV_FILENAME)
+    with dataset.lock:
+        order = dataset.name_order()
+        stop = len(order) if limit is None else offset + limit
+        page = order[offset:stop]
+        return list(zip(dataset.ids[page].tolist(), dataset.names[page].tolist()))
+
+@timed()
+def search_companies(query, limit=10):
+    """
+    Find companies by name: names starting with query first, then typo-tolerant matches.
+
+    Returns:
+        list: Up to limit (ID, Name) tuples of strings.
+    """
+    from emissions_dataset import get_dataset
+
+    if not query.strip():
+        return []
+    return get_dataset(CSV_FILENAME).search_names(query, limit)
+
+@timed()
+def top_companies(n=10):
+    """
+    Return the n companies with the highest total emissions, largest first.
+
+    Returns:
+        list: Dicts with ID, Name and the energy, transportation and total emissions.
+    """
+    from emissions_dataset import get_dataset
+
+    dataset = get_dataset(CSV_FILENAME)
+    with dataset.lock:
+        indices = dataset.top_n(n)
+        return [{"ID": company_id, "Name": name,
+                 "energy_emissions": float(dataset.energy_totals[i]),
+                 "transportation_emissions": float(dataset.transportation_totals[i]),
+                 "total_emissions": float(dataset.totals[i])}
+                for i, company_id, name in zip(indices, dataset.ids[indices].tolist(), dataset.names[indices].tolist())]
+
+@timed()
+def company_rank(company_id, loaded_only=False):
+    """
+    Return a company's rank by total emissions.
+
+    With loaded_only, return None instead of loading the dataset if this
+    process has not loaded it yet, so a point lookup does not parse every row.
+
+    Returns:
+        dict: ``rank`` (1 = highest total emissions) and ``companies``, the number of companies ranked.
+    """
+    from emissions_dataset import get_dataset, loaded_dataset
+
+    company_id = parse_company_id(company_id)
+    dataset = loaded_dataset(CSV_FILENAME) if loaded_only else get_dataset(CSV_FILENAME)
+    if dataset is None:
+        return None
+    with dataset.lock:
+        rank = dataset.rank(company_id)
+        if rank is None:
+            raise CompanyNotFound("Company ID not found.")
+        return {"rank": rank, "companies": len(dataset)}
+
+@timed()
+def generate_reports(top_n=10, parallel=False, statements=False, workers=None, progress=None,
+                     pages_per_volume=None):
+    """
+    Render the graph and data PDF reports and return their file names.
+
+    With parallel or statements the artifacts are rendered in a process pool by
+    report_engine.render_reports, which can also write one statement PDF per
+    company; progress(done, total) is then called as tasks finish. With
+    pages_per_volume the data report is split into files of that many pages.
+    """
+    if parallel or statements:
+        from report_engine import render_reports
+
+        return render_reports(top_n, statements=statements, workers=workers, progress=progress,
+                              pages_per_volume=pages_per_volume)
+
+    from pdf_report import generate_and_save_graph_to_pdf
+
+    return generate_and_save_graph_to_pdf(REPORT_FILENAME, top_n, pages_per_volume)
+
+@timed()
+def export_data(path, columns=None):
+    """
+    Export the stored companies to a Parquet (.parquet) or Arrow (.arrow, .feather)
+    file, optionally only some columns, and return the number exported.
+    """
+    import columnar
+
+    try:
+        return columnar.export_table(path, CSV_FILENAME, columns)
+    except (ImportError, ValueError) as e:
+        raise EmissionsError(str(e))
+
+@timed()
+def import_data(path):
+    """
+    Append the companies of a Parquet or Arrow file written by export_data.
+    Returns the number of imported rows and of rows skipped for an invalid or
+    already stored ID, an invalid name or a non-numeric emission value.
+    """
+    import columnar
+
+    try:
+        imported, skipped = columnar.import_table(path, CSV_FILENAME)
+    except (ImportError, ValueError) as e:
+        raise EmissionsError(str(e))
+    except FileNotFoundError:
+        raise EmissionsError(f"File not found: {path}")
+    return {"imported": imported, "skipped": skipped}
+
+@timed()
+def render_chart(mode, filename):
+    """
+    Render one chart of graph_emission.CHART_MODES to an image file (the format
+    follows its extension) and return the file name.
+    """
+    from graph_emission import CHART_MODES, render_chart as render
+
+    if mode not in CHART_MODES:
+        raise EmissionsError(f"Unknown chart mode: {mode}. Choose one of: {', '.join(CHART_MODES)}.")
+    data = render(mode, os.path.splitext(filename)[1].lstrip(".").lower() or "png")
+    with open(filename, "wb") as file:
+        file.write(data)
+    return filename
+
+@timed()
+def evaluate_scenarios(scenarios, company_id=None, top_n=0):
+    """
+    Project the savings of what-if scenarios on every company at once (see
+    scenarios.activity_matrix for the strategies a scenario is made of).
+
+    Args:
+        scenarios (list): Dicts with a ``name`` and a list of ``strategies``.
+        company_id (str, optional): Also report this company's savings.
+        top_n (int): Also list the top_n companies saving most under each scenario.
+
+    Returns:
+        dict: ``baseline``, the total kg CO2 of all companies, and ``scenarios``:
+            per scenario its name, ``savings`` over all companies and their ``percent``
+            of the baseline, plus ``company`` and ``company_percent`` for company_id
+            and ``top`` (dicts with ID, Name and savings) when top_n is given.
+    """
+    from emissions_dataset import get_dataset
+    from scenarios import ScenarioResults
+
+    if company_id is not None:
+        company_id = parse_company_id(company_id)
+    dataset = get_dataset(CSV_FILENAME)
+    with dataset.lock:
+        try:
+            results = ScenarioResults(dataset.values, scenarios)
+        except (KeyError, TypeError, ValueError) as e:
+            raise EmissionsError(f"Invalid scenario: {e}")
+        report = [{"name": scenario.get("name", f"Scenario {number}"), "savings": float(savings),
+                   "percent": float(savings / results.baseline * 100) if results.baseline else 0.0}
+                  for number, (scenario, savings) in enumerate(zip(results.scenarios, results.portfolio), start=1)]
+        if company_id is not None:
+            row = dataset.id_lookup().find(company_id)
+            if row is None:
+                raise CompanyNotFound("Company ID not found.")
+            total = float(dataset.totals[row])
+            for entry, savings in zip(report, results.company_savings([row])[0].tolist()):
+                entry["company"] = savings
+                entry["company_percent"] = savings / total * 100 if total else 0.0
+        if top_n:
+            rows, savings = results.top_companies(top_n)
+            for entry, scenario_rows, scenario_savings in zip(report, rows, savings):
+                entry["top"] = [{"ID": top_id, "Name": name, "savings": saved}
+                                for top_id, name, saved in zip(dataset.ids[scenario_rows].tolist(),
+                                                                   dataset.names[scenario_rows].tolist(),
+                                                                   scenario_savings.tolist())]
+    return {"baseline": results.baseline, "scenarios": report}
+
+@timed()
+def prune_reports(keep_last=None, max_age_days=None, include_migrated=False):
+    """
+    Delete old report runs outside the retention policy and return how many were
+    deleted. Reports from before the report cache are only pruned with include_migrated.
+    """
+    from report_cache import prune_reports as prune
+
+    return prune(keep_last, max_age_days, include_migrated)
+
+@timed()
+def recompute_emissions(version=None):
+    """
+    Recompute every company's emissions from its stored raw activity under a
+    factor version (the current one by default). See emission_factors.recompute_emissions.
+    """
+    from emission_factors import recompute_emissions as recompute
+
+    try:
+        return recompute(CSV_FILENAME, version)
+    except ValueError as e:
+        raise EmissionsError(str(e))
+
+def factor_versions():
+    """Return the current emission factor version and {version: {field: factor}} of every version."""
+    table = load_factor_table()
+    return {"current": table["current"], "versions": {version: get_factors(version) for version in table["versions"]}}
+
+def add_factor_version(factors):
+    """Add a revised emission factor version, make it current and return its number."""
+    try:
+        return new_factor_version({field: float(value) for field, value in factors.items()})
+    except ValueError as e:
+        raise EmissionsError(str(e))
@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+
+from instrumentation import timed
+
+# Versioned emission-factor table (kg CO2 per unit of monthly activity). Every
+# version is kept, so stored emissions can be recomputed from the raw activity
+# under any of them; "current" is the version new companies are scored with.
+# The table shipped with the code is only the default: versions added since are
+# saved with the data, in the working directory like 'emissions_data.csv'.
+DEFAULT_FACTORS_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emission_factors.json")
+FACTORS_FILENAME = "emission_factors.local.json"
+
+# Monthly activity is annualized when emissions are calculated
+MONTHS_PER_YEAR = 12
+
+# Column order of the factor vectors, the same as the emission columns of the CSV
+FACTOR_FIELDS = ["Car", "Bus", "Train", "Bicycle", "Walking",
+                 "Electricity", "Natural Gas", "Fuel Oil", "Propane", "Coal"]
+
+_table = None
+_factors = {}
+_vectors = {}
+_lock = threading.Lock()
+
+
+def load_factor_table():
+    """Return the factor table, read on first use from FACTORS_FILENAME, or DEFAULT_FACTORS_FILENAME if none was saved."""
+    global _table
+    with _lock:
+        if _table is None:
+            filename = FACTORS_FILENAME if os.path.exists(FACTORS_FILENAME) else DEFAULT_FACTORS_FILENAME
+            with open(filename, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            _table = {"current": int(data["current"]),
+                      "versions": {int(version): factors for version, factors in data["versions"].items()}}
+        return _table
+
+
+def current_factor_version():
+    """Return the factor version new emissions are calculated with."""
+    return load_factor_table()["current"]
+
+
+def get_factors(version=None):
+    """
+    Return {field: factor} of a factor version (the current one by default); missing fields are 1.0.
+
+    The dict is built once per version and shared, so callers must not modify it.
+    """
+    table = load_factor_table()
+    version = table["current"] if version is None else int(version)
+    factors = _factors.get(version)
+    if factors is None:
+        try:
+            stored = table["versions"][version]
+        except KeyError:
+            raise ValueError(f"Unknown emission factor version: {version}")
+        factors = _factors[version] = {field: float(stored.get(field, 1.0)) for field in FACTOR_FIELDS}
+    return factors
+
+
+def factor_vector(version=None):
+    """Return the annualized factors of a version as a NumPy vector in FACTOR_FIELDS order."""
+    import numpy as np
+
+    version = current_factor_version() if version is None else int(version)
+    with _lock:
+        vector = _vectors.get(version)
+    if vector is None:
+        factors = get_factors(version)
+        vector = np.array([factors[field] for field in FACTOR_FIELDS], dtype=np.float64) * MONTHS_PER_YEAR
+        with _lock:
+            _vectors[version] = vector
+    return vector
+
+
+def add_factor_version(factors, make_current=True):
+    """
+    Add a new factor version to the table, save it to FACTORS_FILENAME and return its number.
+
+    Args:
+        factors (dict): {field: factor}; fields left out keep their value from the current version.
+        make_current (bool): Score new companies with this version from now on.
+    """
+    global _table
+    unknown = set(factors) - set(FACTOR_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown emission fields: {', '.join(sorted(unknown))}")
+    table = load_factor_table()
+    new_factors = dict(get_factors(), **{field: float(value) for field, value in factors.items()})
+    version = max(table["versions"]) + 1
+    versions = {**table["versions"], version: new_factors}
+    current = version if make_current else table["current"]
+    data = {"current": current, "versions": {str(v): f for v, f in sorted(versions.items())}}
+    temp_filename = FACTORS_FILENAME + ".tmp"
+    with open(temp_filename, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+    os.replace(temp_filename, FACTORS_FILENAME)
+    with _lock:
+        _table = {"current": current, "versions": versions}
+    return version
+
+
+@timed()
+def recompute_emissions(csv_filename="emissions_data.csv", version=None):
+    """
+    Recompute every stored company's emissions from its raw activity under a factor version.
+
+    The raw monthly activity kept beside the CSV (see emissions_store.activity_filename)
+    is loaded as one N x 10 matrix, so the new emission columns are a single
+    broadcast multiply with the annualized factor vector and the new totals a
+    single matrix-vector product. The CSV and the activity file are then
+    rewritten atomically with the new values and version, reusing the bytes of
+    every unchanged field; tombstoned rows are kept so the row numbers of the
+    tombstones stay valid.
+
+    Returns:
+        dict: The factor version, the number of rows rewritten and the new total emissions
+            of all live companies.
+    """
+    import numpy as np
+    import pandas as pd
+    from emissions_store import get_store, iter_records, read_tombstones, remove_snapshot
+
+    version = current_factor_version() if version is None else int(version)
+    factors = factor_vector(version)
+    store = get_store(csv_filename)
+    with store.write_lock():
+        # The rewrite below replaces the files wholesale; nothing may be left to replay over it
+        store.checkpoint()
+        activity = pd.read_csv(store.activity_filename, usecols=["ID"] + FACTOR_FIELDS, dtype={"ID": str})
+        raw = activity[FACTOR_FIELDS].to_numpy(dtype=np.float64)
+        emissions = raw * factors
+        totals = raw @ factors
+        live = np.ones(len(activity), dtype=bool)
+        for row, id_value in read_tombstones(csv_filename).items():
+            if row < len(activity) and activity["ID"].iat[row] == id_value:
+                live[row] = False
+
+        # New emission columns in the file's column order (ID and Name come first)
+        columns = [FACTOR_FIELDS.index(field) for field in store.fieldnames[2:]]
+        rows = emissions[:, columns].tolist()
+        version_field = str(version).encode()
+
+        def rewrite_csv(line, row):
+            # Emission values are never quoted, so the last ten fields can be split off
+            return line.rsplit(b",", len(columns))[0] + b"," + ",".join(map(repr, rows[row])).encode() + b"\r\n"
+
+        def rewrite_activity(line, row):
+            id_value, _, rest = line.split(b",", 2)
+            return id_value + b"," + version_field + b"," + rest
+
+        # Every row's values change, so the columnar snapshot of the old values goes
+        remove_snapshot(csv_filename)
+        # The activity file is replaced first: after a crash in between, the store
+        # still holds consistent raw data and the recompute can simply be run again
+        for filename, rewrite in ((store.activity_filename, rewrite_activity), (csv_filename, rewrite_csv)):
+            temp_filename = filename + ".tmp"
+            with open(filename, "rb") as src, open(temp_filename, "wb") as dst:
+                dst.write(src.readline())
+                row = 0
+                for line in iter_records(src):
+                    if line.strip():
+                        if row >= len(rows):
+                            raise ValueError("The activity file does not match the emissions file; open the store again to repair it.")
+                        dst.write(rewrite(line, row))
+                        row += 1
+                if row != len(rows):
+                    raise ValueError("The activity file does not match the emissions file; open the store again to repair it.")
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(temp_filename, filename)
+        store.rebuild()
+    return {"version": version, "rows": len(rows), "total_emissions": float(totals[live].sum())}
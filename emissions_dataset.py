@@ -0,0 +1,427 @@
+import os
+import threading
+from bisect import bisect_left, insort
+
+import numpy as np
+import pandas as pd
+
+import columnar
+from emissions_store import DEFAULT_CSV_FILENAME, read_tombstones, snapshot_filename, tombstone_filename
+from instrumentation import increment, timed
+from name_search import NameIndex
+from records import IdLookup, Records, RowStrings, pack_id
+
+TRANSPORTATION_FIELDS = ["Car", "Bus", "Train", "Bicycle", "Walking"]
+ENERGY_FIELDS = ["Electricity", "Natural Gas", "Fuel Oil", "Propane", "Coal"]
+EMISSION_FIELDS = TRANSPORTATION_FIELDS + ENERGY_FIELDS
+
+# Bytes compared at the old end of file to tell an append from a rewrite
+TAIL_CHECK_BYTES = 256
+# Rows parsed from CSV text in one load from which a columnar snapshot is written
+SNAPSHOT_MIN_ROWS = 10000
+
+
+class Ranking:
+    """
+    Rows ordered by total emissions, largest first.
+
+    Kept as a sorted list of ``(-total, row)`` keys, so ties keep file order.
+    Adding or removing a row is a binary search plus a list insert or delete
+    (a memmove of pointers, fast even for millions of rows); the top k rows
+    are the first k keys and a row's rank is the position of its key.
+    """
+
+    def __init__(self, rows=(), totals=()):
+        rows = np.asarray(rows, dtype=np.int64)
+        negated = -np.asarray(totals, dtype=np.float64)
+        order = np.lexsort((rows, negated))
+        self.keys = list(zip(negated[order].tolist(), rows[order].tolist()))
+
+    def add(self, row, total):
+        insort(self.keys, (-total, row))
+
+    def remove(self, row, total):
+        key = (-total, row)
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+
+    def top(self, n):
+        """Return the rows of the n largest totals, largest first."""
+        return [row for _, row in self.keys[:max(0, n)]]
+
+    def rank(self, row, total):
+        """Return the 1-based rank of a row with this total."""
+        return bisect_left(self.keys, (-total, row)) + 1
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class EmissionsDataset:
+    """
+    In-memory, typed view of the emissions CSV shared by the whole process.
+
+    The file is parsed once and kept until its mtime or size changes, so the
+    GUI tabs, the graph and the PDF reports stop re-reading it on every
+    interaction. When the file only grew by appended rows, just the new rows
+    are parsed. Rows deleted through tombstones are left out. ``version``
+    increases each time the data is reloaded and can be used by callers to
+    skip work when nothing changed.
+
+    Parsed rows are held as compact Records (packed IDs, one float64 block,
+    a pool of names). ``ids`` and ``names`` are RowStrings of the live rows,
+    decoded only when read; ``frame`` is a DataFrame built on first use.
+
+    The transportation, energy and grand totals of every row are materialized
+    once per row and a Ranking of the live rows, sorted on first use, is kept
+    beside them. Appended
+    rows are summed and inserted, newly tombstoned rows removed, so top_n()
+    and rank() no longer re-sum and sort every company; only a rewrite of the
+    file (compaction, recompute, outside edits) rebuilds them.
+
+    With pyarrow installed, a full load that parsed many rows also writes them
+    to an uncompressed Arrow file beside the CSV (``<csv>.arrow``). The next
+    process memory-maps that snapshot instead of parsing text and parses only
+    the rows appended to the CSV after it; the CSV stays the file every write
+    goes to, and a snapshot that no longer matches its start is ignored.
+    """
+
+    def __init__(self, csv_filename=DEFAULT_CSV_FILENAME):
+        self.csv_filename = csv_filename
+        self.lock = threading.RLock()
+        self.version = 0
+        self._stat = None
+        self._tombstone_stat = None
+        self._tail = None
+        # Every parsed row, including tombstoned ones, so row numbers match the file
+        self._records = _empty_records()
+        self._columns = ["ID", "Name"] + EMISSION_FIELDS
+        self._reset_totals()
+        self._set_frame()
+
+    def refresh(self):
+        """Reload the CSV if it or its tombstones changed on disk since the last load."""
+        with self.lock:
+            stat = _file_stat(self.csv_filename)
+            tombstone_stat = _file_stat(tombstone_filename(self.csv_filename))
+            if stat == self._stat and tombstone_stat == self._tombstone_stat:
+                return self
+            if stat != self._stat:
+                if stat is None:
+                    self._records = _empty_records()
+                    self._reset_totals()
+                elif self._is_append(stat):
+                    # Rows were only appended (the usual "Add Data" case): parse just the new tail
+                    increment("emissions_dataset.tail_loads")
+                    new_rows = self._load(self._stat[1])
+                    self._records.extend(new_rows)
+                    self._append_totals(new_rows)
+                else:
+                    increment("emissions_dataset.full_loads")
+                    self._records = self._load_full(stat)
+                    self._reset_totals()
+                self._stat = stat
+                self._tail = self._read_tail(stat[1] if stat else None)
+            self._tombstone_stat = tombstone_stat
+            self._update_dead()
+            self._set_frame()
+            self.version += 1
+        return self
+
+    def _reset_totals(self):
+        # Materialize the totals of every parsed row; the ranking is sorted on first use
+        self._raw_transportation = _group_sum(self._records.values, TRANSPORTATION_FIELDS)
+        self._raw_energy = _group_sum(self._records.values, ENERGY_FIELDS)
+        self._raw_totals = self._raw_transportation + self._raw_energy
+        self._dead = self._read_dead()
+        # Built on the first top_n() or rank(), and on the first name search
+        self._ranking = None
+        self._id_rows = None
+        self._name_index = None
+
+    def _build_ranking(self):
+        # Rank all live rows with one sort; an ID's row is the first live row holding it
+        rows = self._live_rows
+        self._ranking = Ranking(rows.tolist(), self._raw_totals[rows])
+        keys = self._records.keys_at(rows)
+        self._id_rows = dict(zip(reversed(keys), rows[::-1].tolist()))
+
+    def _append_totals(self, new_rows):
+        # Sum only the appended rows and insert them into the ranking
+        start = len(self._raw_totals)
+        transportation = _group_sum(new_rows.values, TRANSPORTATION_FIELDS)
+        energy = _group_sum(new_rows.values, ENERGY_FIELDS)
+        totals = transportation + energy
+        self._raw_transportation = np.concatenate([self._raw_transportation, transportation])
+        self._raw_energy = np.concatenate([self._raw_energy, energy])
+        self._raw_totals = np.concatenate([self._raw_totals, totals])
+        if self._ranking is None and self._name_index is None:
+            return
+        rows = np.arange(len(new_rows))
+        for row, (key, name, total) in enumerate(zip(new_rows.keys_at(rows), new_rows.names_at(rows),
+                                                     totals.tolist()), start):
+            if self._ranking is not None:
+                self._ranking.add(row, total)
+                self._id_rows.setdefault(key, row)
+            if self._name_index is not None:
+                self._name_index.add(row, name)
+
+    def _read_dead(self):
+        # Rows whose row number and ID match a tombstone
+        records = self._records
+        return {row for row, id_value in read_tombstones(self.csv_filename).items()
+                if row < len(records) and records.id(row) == id_value}
+
+    def _update_dead(self):
+        # Only the rows that died (or came back) since the last refresh touch the ranking
+        records = self._records
+        dead = self._read_dead()
+        orphans = set()
+        ranked = self._ranking is not None
+        for row in dead - self._dead:
+            if ranked:
+                self._ranking.remove(row, float(self._raw_totals[row]))
+                if self._id_rows.get(records.key(row)) == row:
+                    del self._id_rows[records.key(row)]
+                    orphans.add(records.id(row))
+            if self._name_index is not None:
+                self._name_index.remove(row, records.name(row))
+        for row in self._dead - dead:
+            if ranked:
+                self._ranking.add(row, float(self._raw_totals[row]))
+                self._id_rows.setdefault(records.key(row), row)
+            if self._name_index is not None:
+                self._name_index.add(row, records.name(row))
+        self._dead = dead
+        # An ID deleted and added again since the last refresh lives on in its new row
+        for id_value in orphans:
+            rows = [row for row in records.rows_with_id(id_value).tolist() if row not in dead]
+            if rows:
+                self._id_rows[pack_id(id_value)] = rows[0]
+
+    def _read_tail(self, size):
+        # Last bytes of the loaded file, used to recognise a later append-only change
+        if size is None:
+            return None
+        with open(self.csv_filename, "rb") as file:
+            file.seek(max(0, size - TAIL_CHECK_BYTES))
+            return file.read(TAIL_CHECK_BYTES)
+
+    def _is_append(self, stat):
+        if self._stat is None or len(self._records) == 0 or stat[1] <= self._stat[1]:
+            return False
+        tail = self._tail
+        return tail is not None and tail.endswith(b"\n") and self._read_tail(self._stat[1]) == tail
+
+    def _load_full(self, stat):
+        # All rows: from the columnar snapshot if it still matches the start of the
+        # CSV, then only the rows appended after it are parsed as text
+        snapshot = self._read_snapshot(stat)
+        if snapshot is not None:
+            records, size = snapshot
+            if size == stat[1]:
+                return records
+            new_rows = self._load(size)
+            records.extend(new_rows)
+            parsed = len(new_rows)
+        else:
+            records = self._load()
+            parsed = len(records)
+        if parsed >= SNAPSHOT_MIN_ROWS and columnar.available():
+            self._write_snapshot(records, stat)
+        return records
+
+    def _snapshot_check(self, size):
+        # Bytes of the CSV a snapshot was written from: its start and the end of the snapshotted part
+        with open(self.csv_filename, "rb") as file:
+            head = file.read(TAIL_CHECK_BYTES)
+        return head.hex() + ":" + self._read_tail(size).hex()
+
+    @timed("emissions_dataset.snapshot_load")
+    def _read_snapshot(self, stat):
+        filename = snapshot_filename(self.csv_filename)
+        if not columnar.available() or not os.path.exists(filename):
+            return None
+        try:
+            metadata = columnar.read_metadata(filename)
+            size = int(metadata["csv_size"])
+            # Written from this very file, or from its start before rows were appended
+            if size == stat[1]:
+                if int(metadata["csv_mtime"]) != stat[0]:
+                    return None
+            elif size > stat[1] or metadata["csv_check"] != self._snapshot_check(size):
+                return None
+            records, columns = columnar.read_records(filename, EMISSION_FIELDS)
+        except (OSError, KeyError, ValueError, columnar.pa.ArrowException):
+            # A stale or damaged snapshot is only a lost shortcut; the CSV is parsed instead
+            return None
+        if len(records) != int(metadata["rows"]):
+            return None
+        increment("emissions_dataset.snapshot_loads")
+        self._columns = columns
+        return records, size
+
+    @timed("emissions_dataset.snapshot_write")
+    def _write_snapshot(self, records, stat):
+        # Only a file left unchanged while it was parsed matches the rows in records
+        if _file_stat(self.csv_filename) != stat:
+            return
+        metadata = {"csv_size": stat[1], "csv_mtime": stat[0], "csv_check": self._snapshot_check(stat[1]),
+                    "rows": len(records)}
+        try:
+            columnar.write_records(snapshot_filename(self.csv_filename), records, EMISSION_FIELDS,
+                                   self._columns, metadata)
+        except OSError:
+            pass
+
+    @timed("emissions_dataset.parse")
+    def _load(self, offset=0):
+        # Parse CSV rows with pandas and pack them into Records; the frame is dropped
+        dtypes = {"ID": str, "Name": str}
+        try:
+            if offset:
+                with open(self.csv_filename, "rb") as file:
+                    file.seek(offset)
+                    frame = pd.read_csv(file, header=None, names=self._columns, dtype=dtypes)
+            else:
+                frame = pd.read_csv(self.csv_filename, dtype=dtypes)
+                self._columns = list(frame.columns)
+        except pd.errors.EmptyDataError:
+            return _empty_records()
+        return Records.from_columns(frame["ID"].fillna("").tolist(), frame["Name"].fillna("").tolist(),
+                                    frame[EMISSION_FIELDS].to_numpy(dtype=np.float64))
+
+    def _set_frame(self):
+        records = self._records
+        if self._dead:
+            alive = np.ones(len(records), dtype=bool)
+            alive[list(self._dead)] = False
+            self._live_rows = np.flatnonzero(alive)
+            live = self._live_rows
+        else:
+            # Every row is live: the arrays below are views, not copies
+            self._live_rows = np.arange(len(records))
+            live = slice(None)
+        # One contiguous 2-D float block of the emission columns of the live rows
+        self.values = records.values[live]
+        self.ids = RowStrings(records.ids_at, self._live_rows)
+        self.names = RowStrings(records.names_at, self._live_rows)
+        self.transportation_totals = self._raw_transportation[live]
+        self.energy_totals = self._raw_energy[live]
+        self.totals = self._raw_totals[live]
+        self._frame = None
+        self._name_order = None
+        self._id_lookup = None
+
+    @property
+    def frame(self):
+        """The live rows as a DataFrame (ID, Name and the emission columns), built on first use."""
+        with self.lock:
+            if self._frame is None:
+                frame = pd.DataFrame({"ID": pd.Series(self.ids.tolist(), dtype=str),
+                                      "Name": pd.Series(self.names.tolist(), dtype=str)})
+                for position, field in enumerate(EMISSION_FIELDS):
+                    frame[field] = self.values[:, position]
+                self._frame = frame
+            return self._frame
+
+    def column_group_sum(self, fields):
+        """Per-company sum of the given emission columns."""
+        columns = [EMISSION_FIELDS.index(field) for field in fields]
+        return self.values[:, columns].sum(axis=1)
+
+    def top_n(self, n=10):
+        """
+        Row indices of the n companies with the highest total emissions,
+        largest first, read off the front of the ranking.
+        """
+        with self.lock:
+            if self._ranking is None:
+                self._build_ranking()
+            rows = self._ranking.top(n)
+            return np.searchsorted(self._live_rows, rows).astype(np.intp)
+
+    def rank(self, company_id):
+        """
+        Return the 1-based emissions rank of a company (1 = highest total),
+        or None if it is not stored.
+        """
+        with self.lock:
+            if self._ranking is None:
+                self._build_ranking()
+            row = self._id_rows.get(pack_id(company_id))
+            if row is None:
+                return None
+            return self._ranking.rank(row, float(self._raw_totals[row]))
+
+    def search_names(self, query, limit=10):
+        """
+        Return up to limit (ID, Name) pairs of companies whose name starts with
+        query, followed by fuzzy matches that share most of its trigrams.
+        """
+        with self.lock:
+            if self._name_index is None:
+                self._name_index = NameIndex(self._live_rows, self.names.tolist())
+            rows = self._name_index.search(query, limit)
+            return list(zip(self._records.ids_at(rows), self._records.names_at(rows)))
+
+    def name_order(self):
+        """Row indices sorted alphabetically by company name, computed once per version."""
+        with self.lock:
+            if self._name_order is None:
+                self._name_order = np.argsort(np.array(self.names.tolist(), dtype=object), kind="stable")
+            return self._name_order
+
+    def id_lookup(self):
+        """IdLookup of the row index of every ID, computed once per version."""
+        with self.lock:
+            if self._id_lookup is None:
+                self._id_lookup = IdLookup(self._records, self._live_rows)
+            return self._id_lookup
+
+    def __len__(self):
+        return len(self._live_rows)
+
+    @property
+    def empty(self):
+        return len(self._live_rows) == 0
+
+
+def _file_stat(filename):
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _group_sum(values, fields):
+    # Per-row sum of a group of emission columns; empty cells count as 0 so every total is comparable
+    columns = [EMISSION_FIELDS.index(field) for field in fields]
+    return np.nan_to_num(values[:, columns]).sum(axis=1)
+
+
+def _empty_records():
+    return Records.empty(len(EMISSION_FIELDS))
+
+
+_datasets = {}
+_datasets_lock = threading.Lock()
+
+
+def get_dataset(csv_filename=DEFAULT_CSV_FILENAME):
+    """Return the shared, up-to-date dataset for a CSV file."""
+    key = os.path.abspath(csv_filename)
+    with _datasets_lock:
+        dataset = _datasets.get(key)
+        if dataset is None:
+            dataset = _datasets[key] = EmissionsDataset(csv_filename)
+    return dataset.refresh()
+
+
+def loaded_dataset(csv_filename=DEFAULT_CSV_FILENAME):
+    """Return the up-to-date dataset for a CSV file if this process already loaded it, else None."""
+    with _datasets_lock:
+        dataset = _datasets.get(os.path.abspath(csv_filename))
+    return dataset.refresh() if dataset is not None else None
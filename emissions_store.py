@@ -0,0 +1,671 @@
+import csv
+import io
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from emission_factors import MONTHS_PER_YEAR, current_factor_version, get_factors
+from instrumentation import timed
+from wal import FileLock, WriteAheadLog
+
+# Column order of emissions_data.csv
+FIELDNAMES = ["ID", "Name", "Car", "Bus", "Train", "Bicycle", "Walking",
+              "Electricity", "Natural Gas", "Fuel Oil", "Propane", "Coal"]
+
+DEFAULT_CSV_FILENAME = "emissions_data.csv"
+
+# Columns of the raw activity file kept beside the CSV: the monthly activity a
+# row was calculated from and the emission factor version that was used
+ACTIVITY_FIELDNAMES = ["ID", "Factor Version"] + FIELDNAMES[2:]
+ACTIVITY_HEADER = (",".join(ACTIVITY_FIELDNAMES) + "\r\n").encode("utf-8")
+
+# Version of the SQLite index layout; older index files are rebuilt
+# (3: the rebuild also creates the raw activity file)
+INDEX_VERSION = 3
+
+# Number of tombstones after which a delete triggers a background compaction
+COMPACTION_THRESHOLD = 1000
+
+# Rows per group commit when appending many rows, e.g. a bulk import
+COMMIT_BATCH_ROWS = 10000
+# Size of the write-ahead log after which the data files are fsynced and the log is emptied
+CHECKPOINT_BYTES = 4 << 20
+
+
+class EmissionsStore:
+    """
+    CSV-backed emissions store with a primary-key index on ID.
+
+    The CSV file stays the source of truth. Beside it, an SQLite file
+    (``<csv>.idx``) maps every ID to the byte offset and length of its row,
+    so existence checks, retrievals and deletes no longer scan the CSV.
+    The index remembers the size and mtime of the CSV it describes and is
+    rebuilt with a single pass whenever the CSV was changed by someone else
+    (this is also the one-time migration for an existing CSV).
+
+    Deletes do not touch the CSV. They append a tombstone ``<row>,<ID>`` to
+    ``<csv>.del`` (row being the 0-based data row number) and drop the ID
+    from the index; readers skip tombstoned rows (see read_tombstones).
+    Once enough tombstones pile up, compact() writes the live rows to a
+    temporary file and atomically renames it over the CSV.
+
+    The raw monthly activity of every row is kept line for line in
+    ``<csv>.activity`` (see ACTIVITY_FIELDNAMES), so emissions can be
+    recomputed when a factor is revised (emission_factors.recompute_emissions).
+    Rows stored without their activity, e.g. those written before this file
+    existed, get it derived back from their emissions and the current factors.
+
+    Several processes (GUI, CLI, server, scripts) may write the same files.
+    Every write holds an advisory lock on ``<csv>.lock`` and goes through a
+    write-ahead log (``<csv>.wal``): the batch is logged with one fsync,
+    then applied to the CSV, activity, tombstone and index files. Writers
+    arriving while a commit is in progress are queued and committed together
+    as the next batch, so concurrent adds share a single fsync. A batch left
+    unfinished by a crash is replayed by the next writer or on open; replay
+    skips adds of IDs already stored and deletes of IDs already gone.
+    """
+
+    def __init__(self, csv_filename=DEFAULT_CSV_FILENAME, compaction_threshold=COMPACTION_THRESHOLD):
+        self.csv_filename = csv_filename
+        self.index_filename = csv_filename + ".idx"
+        self.tombstone_filename = tombstone_filename(csv_filename)
+        self.activity_filename = activity_filename(csv_filename)
+        self.compaction_threshold = compaction_threshold
+        self.tombstone_count = len(read_tombstones(csv_filename))
+        # Lock order: file_lock (other processes) before lock (this process's connection)
+        self.file_lock = FileLock(csv_filename + ".lock")
+        self.lock = threading.RLock()
+        self.wal = WriteAheadLog(csv_filename + ".wal")
+        self._commit_condition = threading.Condition()
+        self._pending = []
+        self._committing = False
+        self._compaction_thread = None
+        with self.write_lock():
+            self.conn = sqlite3.connect(self.index_filename, check_same_thread=False)
+            # The index is derived data: a write lost by a power failure shows up as a
+            # stale CSV stat and is rebuilt, so SQLite's own fsyncs are not needed
+            self.conn.execute("PRAGMA synchronous = OFF")
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS id_index")
+                self.conn.execute("DROP TABLE IF EXISTS meta")
+                self.conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS id_index (id TEXT NOT NULL, offset INTEGER NOT NULL, "
+                              "length INTEGER NOT NULL, row INTEGER NOT NULL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS id_index_id ON id_index (id)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            self.conn.commit()
+            self.fieldnames = list(FIELDNAMES)
+            self._recover(full=True)
+            if self._sync_locked():
+                self._checkpoint()
+
+    @contextmanager
+    def write_lock(self):
+        """Hold the cross-process file lock and this store's lock, in that order."""
+        with self.file_lock, self.lock:
+            yield
+
+    # Index maintenance
+
+    def _csv_stat(self):
+        try:
+            st = os.stat(self.csv_filename)
+        except FileNotFoundError:
+            return (0, 0)
+        return (st.st_size, st.st_mtime_ns)
+
+    def _save_stat(self, rows):
+        size, mtime_ns = self._csv_stat()
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              [("size", size), ("mtime_ns", mtime_ns), ("rows", rows)])
+
+    def _indexed_stat(self):
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        return (meta.get("size"), meta.get("mtime_ns"))
+
+    def _row_count(self):
+        # Number of data rows in the CSV, live or tombstoned
+        return self.conn.execute("SELECT value FROM meta WHERE key = 'rows'").fetchone()[0]
+
+    def sync(self):
+        """Rebuild the index if the CSV changed since it was last indexed."""
+        with self.lock:
+            if self._indexed_stat() == self._csv_stat():
+                return
+        # Changed by a write in progress, a crashed writer or an edit outside the store:
+        # wait for the writers, finish what a crash left behind, then reindex
+        with self.write_lock():
+            self._recover()
+            if self._sync_locked():
+                self._checkpoint()
+
+    def _sync_locked(self):
+        # Rebuild under write_lock() if the CSV is stale; returns True if it was
+        if self._indexed_stat() != self._csv_stat():
+            self.rebuild()
+            return True
+        return False
+
+    @timed()
+    def rebuild(self):
+        """Index every live row of the CSV in a single sequential pass."""
+        with self.write_lock():
+            # Rows may have changed anywhere in the file, not just been appended
+            remove_snapshot(self.csv_filename)
+            self.conn.execute("DELETE FROM id_index")
+            tombstones = read_tombstones(self.csv_filename)
+            self.tombstone_count = len(tombstones)
+            row = 0
+            try:
+                with open(self.csv_filename, "rb") as file:
+                    header = file.readline()
+                    if header:
+                        self.fieldnames = next(csv.reader([header.decode("utf-8")]))
+                    offset = len(header)
+                    entries = []
+                    for line in iter_records(file):
+                        id_value = _line_id(line)
+                        if id_value:
+                            if tombstones.get(row) != id_value:
+                                entries.append((id_value, offset, len(line), row))
+                            row += 1
+                        offset += len(line)
+                        if len(entries) >= 10000:
+                            self._insert_entries(entries)
+                            entries = []
+                    self._insert_entries(entries)
+                self._repair_activity()
+            except FileNotFoundError:
+                pass
+            self._save_stat(row)
+            self.conn.commit()
+
+    def _repair_activity(self):
+        # Make the activity file hold one line per data row with a matching ID;
+        # missing or mismatched lines are derived from the row's emissions
+        tmp_filename = self.activity_filename + ".tmp"
+        try:
+            src = open(self.activity_filename, "rb")
+        except FileNotFoundError:
+            src = io.BytesIO()
+        with src, open(self.csv_filename, "rb") as csv_file, open(tmp_filename, "wb") as dst:
+            changed = src.readline() != ACTIVITY_HEADER
+            dst.write(ACTIVITY_HEADER)
+            csv_file.readline()
+            for line in iter_records(csv_file):
+                id_value = _line_id(line)
+                if not id_value:
+                    continue
+                activity_line = src.readline()
+                if not activity_line.endswith(b"\n") or _line_id(activity_line) != id_value:
+                    values = next(csv.reader([line.decode("utf-8")]))
+                    activity_line = self._activity_line(dict(zip(self.fieldnames, values)))
+                    changed = True
+                dst.write(activity_line)
+            changed = changed or src.read(1) != b""
+        if changed:
+            os.replace(tmp_filename, self.activity_filename)
+        else:
+            os.remove(tmp_filename)
+
+    def _activity_line(self, row):
+        # Raw activity line of a row: taken from row["activity"] when the caller has it,
+        # otherwise derived from the stored emissions with the current factors
+        if "activity" in row:
+            version = row["factor_version"]
+            activity = [float(row["activity"][field]) for field in FIELDNAMES[2:]]
+        else:
+            version = current_factor_version()
+            factors = get_factors(version)
+            activity = [float(row[field] or 0) / (MONTHS_PER_YEAR * factors[field]) if factors[field] else 0.0
+                        for field in FIELDNAMES[2:]]
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow([row["ID"], version] + activity)
+        return buffer.getvalue().encode("utf-8")
+
+    def _insert_entries(self, entries):
+        self.conn.executemany("INSERT INTO id_index (id, offset, length, row) VALUES (?, ?, ?, ?)", entries)
+
+    def _lookup(self, id_value):
+        # Legacy files may hold an ID twice; the first row wins, as with the old linear scans
+        return self.conn.execute("SELECT offset, length FROM id_index WHERE id = ? ORDER BY offset LIMIT 1",
+                                 (str(id_value),)).fetchone()
+
+    # Public API
+
+    def exists(self, id_value):
+        """Return True if a row with this ID is stored."""
+        self.sync()
+        with self.lock:
+            return self._lookup(id_value) is not None
+
+    def get(self, id_value):
+        """Return the stored row for an ID as a dict of strings, or None."""
+        self.sync()
+        for attempt in range(2):
+            with self.lock:
+                entry = self._lookup(id_value)
+                if entry is None:
+                    return None
+                offset, length = entry
+                with open(self.csv_filename, "rb") as file:
+                    file.seek(offset)
+                    line = file.read(length)
+            if _line_id(line) == str(id_value):
+                break
+            # Another process compacted the CSV under us; wait for it and reindex
+            with self.write_lock():
+                self._sync_locked()
+        values = next(csv.reader([line.decode("utf-8")]))
+        return dict(zip(self.fieldnames, values))
+
+    def append(self, row):
+        """
+        Append a row (dict keyed by column name) to the CSV and index it.
+
+        The raw monthly activity can be passed as row["activity"] ({field: value})
+        together with row["factor_version"]; it is written to the activity file.
+        """
+        self.append_many([row])
+
+    def insert(self, row):
+        """
+        Append a row as in append() unless its ID is already stored. The check and
+        the write happen in one commit, so concurrent writers in other processes
+        cannot both add the same ID. Returns True if the row was written.
+        """
+        return self._commit([["insert", self._log_row(row)]])[0]
+
+    def append_many(self, rows):
+        """
+        Append rows (dicts keyed by column name, optionally with their raw
+        activity as in append()) to the CSV in one buffered pass and index
+        them. ``rows`` may be any iterable, including a generator, so large
+        imports never hold all rows in memory; they are committed in batches
+        of COMMIT_BATCH_ROWS.
+        Returns the number of rows written.
+        """
+        count = 0
+        ops = []
+        for row in rows:
+            ops.append(["add", self._log_row(row)])
+            if len(ops) >= COMMIT_BATCH_ROWS:
+                count += sum(self._commit(ops))
+                ops = []
+        if ops:
+            count += sum(self._commit(ops))
+        return count
+
+    def ids(self):
+        """Return the set of all stored IDs."""
+        self.sync()
+        with self.lock:
+            return {id_value for (id_value,) in self.conn.execute("SELECT DISTINCT id FROM id_index")}
+
+    def delete(self, id_value):
+        """
+        Delete every row for an ID. Returns False if the ID is not stored.
+
+        Only a tombstone is appended and the ID is dropped from the index;
+        the CSV itself is left alone until the next compaction.
+        """
+        deleted = self._commit([["delete", str(id_value)]])[0]
+        if deleted and self.tombstone_count >= self.compaction_threshold:
+            self.compact_in_background()
+        return deleted
+
+    # Write-ahead log and group commit
+
+    def _log_row(self, row):
+        # The part of a row that is written, as a JSON-serializable dict for the log
+        logged = {key: row[key] for key in self.fieldnames}
+        if "activity" in row:
+            logged["activity"] = {field: row["activity"][field] for field in FIELDNAMES[2:]}
+            logged["factor_version"] = row["factor_version"]
+        return logged
+
+    def _commit(self, ops):
+        # Group commit: the first writer to arrive becomes the leader and commits
+        # everything queued by then as one batch; writers arriving meanwhile wait
+        # and are committed together by the next leader. Returns the op results.
+        commit = _PendingCommit(ops)
+        with self._commit_condition:
+            self._pending.append(commit)
+            while self._committing and not commit.done:
+                self._commit_condition.wait()
+            if not commit.done:
+                self._committing = True
+                batch, self._pending = self._pending, []
+        if not commit.done:
+            try:
+                self._commit_batch(batch)
+            finally:
+                with self._commit_condition:
+                    self._committing = False
+                    for pending in batch:
+                        pending.done = True
+                    self._commit_condition.notify_all()
+        if commit.error is not None:
+            raise commit.error
+        return commit.results
+
+    def _commit_batch(self, batch):
+        ops = [op for commit in batch for op in commit.ops]
+        try:
+            with self.write_lock():
+                self._recover()
+                self._sync_locked()
+                self.wal.append(ops)
+                results = self._apply(ops)
+                self.wal.mark_applied(self._file_sizes())
+                if self.wal.size() >= CHECKPOINT_BYTES:
+                    self._checkpoint()
+        except Exception as e:
+            for commit in batch:
+                commit.error = e
+            return
+        start = 0
+        for commit in batch:
+            commit.results = results[start:start + len(commit.ops)]
+            start += len(commit.ops)
+
+    def _apply(self, ops, replay=False):
+        # Apply logged ops to the data files and the index; consecutive adds are
+        # appended in one pass. On replay, adds of stored IDs and deletes of
+        # missing ones are skipped, so a batch can be applied twice.
+        results = []
+        rows = []
+        row_ids = set()
+        for op, arg in ops:
+            if op in ("add", "insert"):
+                unique = replay or op == "insert"
+                added = not (unique and (arg["ID"] in row_ids or self._lookup(arg["ID"]) is not None))
+                if added:
+                    rows.append(arg)
+                    row_ids.add(arg["ID"])
+                results.append(added)
+            else:
+                if rows:
+                    self._apply_append(rows)
+                    rows = []
+                    row_ids = set()
+                results.append(self._apply_delete(arg))
+        if rows:
+            self._apply_append(rows)
+        self.conn.commit()
+        return results
+
+    def _apply_append(self, rows):
+        buffer = io.StringIO()
+        with open(self.csv_filename, "ab") as file, open(self.activity_filename, "ab") as activity_file:
+            if activity_file.tell() == 0:
+                activity_file.write(ACTIVITY_HEADER)
+            offset = file.tell()
+            if offset == 0:
+                self.fieldnames = list(FIELDNAMES)
+            writer = csv.DictWriter(buffer, fieldnames=self.fieldnames)
+            if offset == 0:
+                writer.writeheader()
+            elif not self._ends_with_newline():
+                buffer.write("\r\n")
+            offset += file.write(buffer.getvalue().encode("utf-8"))
+            row_number = self._row_count()
+            entries = []
+            for row in rows:
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow({key: row[key] for key in self.fieldnames})
+                data = buffer.getvalue().encode("utf-8")
+                file.write(data)
+                activity_file.write(self._activity_line(row))
+                entries.append((str(row["ID"]), offset, len(data), row_number + len(entries)))
+                offset += len(data)
+            self._insert_entries(entries)
+        self._save_stat(row_number + len(entries))
+
+    def _apply_delete(self, id_value):
+        rows = [row for (row,) in self.conn.execute("SELECT row FROM id_index WHERE id = ?", (id_value,))]
+        if not rows:
+            return False
+        # Not fsynced: the write-ahead log already holds the delete
+        with open(self.tombstone_filename, "a", newline="") as file:
+            file.write("".join(f"{row},{id_value}\n" for row in rows))
+        self.conn.execute("DELETE FROM id_index WHERE id = ?", (id_value,))
+        self.tombstone_count += len(rows)
+        return True
+
+    def _file_sizes(self):
+        sizes = []
+        for filename in (self.csv_filename, self.activity_filename, self.tombstone_filename):
+            try:
+                sizes.append(os.path.getsize(filename))
+            except FileNotFoundError:
+                sizes.append(0)
+        return sizes
+
+    def checkpoint(self):
+        """
+        Make every logged write durable in the data files and empty the write-ahead
+        log, finishing first any batch a crashed writer left behind. Callers that
+        rewrite the files wholesale (e.g. a recompute) checkpoint under write_lock().
+        """
+        with self.write_lock():
+            self._recover()
+            self._sync_locked()
+            self._checkpoint()
+
+    def _checkpoint(self):
+        with self.write_lock():
+            for filename in (self.csv_filename, self.activity_filename, self.tombstone_filename):
+                if os.path.exists(filename):
+                    with open(filename, "ab") as file:
+                        os.fsync(file.fileno())
+            if self.wal.size():
+                self.wal.truncate()
+
+    def _recover(self, full=False):
+        # Finish the work of a writer that crashed; called under write_lock(). A log
+        # not ending with an applied marker has its last batch redone. With full=True
+        # (on open), data files shorter than the last marker recorded, i.e. applied
+        # writes lost by a power failure, have the whole log replayed.
+        clean = self.wal.is_clean()
+        if clean and not (full and self._lost_writes(self.wal.last_sizes())):
+            return
+        records = self.wal.records()
+        markers = [sizes for ops, sizes in records if sizes is not None]
+        lost = self._lost_writes(markers[-1] if markers else None)
+        # A half-written last line of a data file belongs to the batch being redone
+        for filename in (self.csv_filename, self.activity_filename, self.tombstone_filename):
+            _truncate_torn_line(filename)
+        self.tombstone_count = len(read_tombstones(self.csv_filename))
+        self._sync_locked()
+        for ops, sizes in records:
+            if lost or sizes is None:
+                self._apply(ops, replay=True)
+        self._checkpoint()
+
+    def _lost_writes(self, sizes):
+        return sizes is not None and any(size < logged for size, logged in zip(self._file_sizes(), sizes))
+
+    def _ends_with_newline(self):
+        with open(self.csv_filename, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    @timed()
+    def compact(self):
+        """
+        Rewrite the CSV without its tombstoned rows.
+
+        Live rows are copied byte for byte into a temporary file, which is
+        fsynced and atomically renamed over the CSV, so a crash leaves either
+        the old or the new file. Returns the number of rows removed.
+        """
+        with self.write_lock():
+            self._recover()
+            self._sync_locked()
+            tombstones = read_tombstones(self.csv_filename)
+            if not tombstones:
+                return 0
+            tmp_filename = self.csv_filename + ".tmp"
+            activity_tmp_filename = self.activity_filename + ".tmp"
+            entries = []
+            row = 0
+            with open(self.csv_filename, "rb") as src, open(tmp_filename, "wb") as dst, \
+                    open(self.activity_filename, "rb") as activity_src, open(activity_tmp_filename, "wb") as activity_dst:
+                header = src.readline()
+                offset = dst.write(header)
+                activity_dst.write(activity_src.readline())
+                for line in iter_records(src):
+                    id_value = _line_id(line)
+                    if not id_value:
+                        continue
+                    # The activity file holds exactly one line per data row
+                    activity_line = activity_src.readline()
+                    if tombstones.get(row) != id_value:
+                        offset += dst.write(line)
+                        activity_dst.write(activity_line)
+                        entries.append((id_value, offset - len(line), len(line), len(entries)))
+                    row += 1
+                for file in (dst, activity_dst):
+                    file.flush()
+                    os.fsync(file.fileno())
+            # Logged deletes refer to row numbers that are about to change, so the
+            # log must not be replayed over the compacted file
+            self._checkpoint()
+            # The CSV is replaced first: if the activity file were left behind by a
+            # crash, the changed CSV triggers a rebuild, which repairs it
+            remove_snapshot(self.csv_filename)
+            os.replace(tmp_filename, self.csv_filename)
+            os.replace(activity_tmp_filename, self.activity_filename)
+            try:
+                os.remove(self.tombstone_filename)
+            except FileNotFoundError:
+                pass
+
+            # Row numbers and offsets all moved; reload the index from the copy pass
+            self.conn.execute("DELETE FROM id_index")
+            self._insert_entries(entries)
+            self._save_stat(len(entries))
+            self.conn.commit()
+            self.tombstone_count = 0
+            return row - len(entries)
+
+    def compact_in_background(self):
+        """Start compact() on a daemon thread unless one is already running."""
+        with self.lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self.compact, name="store-compaction", daemon=True)
+            self._compaction_thread.start()
+
+
+class _PendingCommit:
+    # Ops of one writer waiting in a group commit, and their outcome
+    def __init__(self, ops):
+        self.ops = ops
+        self.results = None
+        self.error = None
+        self.done = False
+
+
+def tombstone_filename(csv_filename):
+    """Return the name of the tombstone file kept beside a CSV file."""
+    return csv_filename + ".del"
+
+
+def activity_filename(csv_filename):
+    """Return the name of the raw activity file kept beside a CSV file."""
+    return csv_filename + ".activity"
+
+
+def snapshot_filename(csv_filename):
+    """Return the name of the columnar snapshot of a CSV file (see emissions_dataset)."""
+    return csv_filename + ".arrow"
+
+
+def remove_snapshot(csv_filename):
+    """Drop the columnar snapshot of a CSV file whose rows were rewritten in place."""
+    try:
+        os.remove(snapshot_filename(csv_filename))
+    except FileNotFoundError:
+        pass
+
+
+def read_tombstones(csv_filename):
+    """
+    Return the deleted rows of a CSV file as {row number: ID}.
+
+    A row is deleted only if both its 0-based data row number and its ID
+    match a tombstone.
+    """
+    tombstones = {}
+    try:
+        with open(tombstone_filename(csv_filename), "r", newline="") as file:
+            for line in file:
+                row, _, id_value = line.strip().partition(",")
+                if row:
+                    tombstones[int(row)] = id_value
+    except FileNotFoundError:
+        pass
+    return tombstones
+
+
+def iter_records(file):
+    """
+    Yield the raw records of a CSV file opened in binary mode, from its current
+    position. A quoted field may hold line breaks (e.g. a name entered on two
+    lines), so lines are joined until their quotes balance: row numbers and
+    offsets then count records, as pandas and the csv module do.
+    """
+    pending = b""
+    for line in file:
+        if not pending and b'"' not in line:
+            yield line
+            continue
+        pending += line
+        # Quotes inside a quoted field are doubled, so an odd count means the field goes on
+        if pending.count(b'"') % 2 == 0:
+            yield pending
+            pending = b""
+    if pending:
+        yield pending
+
+
+def _truncate_torn_line(filename):
+    # Cut a file back to its last complete line, dropping what a crash left half-written
+    try:
+        file = open(filename, "rb+")
+    except FileNotFoundError:
+        return
+    with file:
+        end = position = file.seek(0, os.SEEK_END)
+        while position > 0:
+            start = max(0, position - (1 << 16))
+            file.seek(start)
+            newline = file.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                if start + newline + 1 < end:
+                    file.truncate(start + newline + 1)
+                return
+            position = start
+
+
+def _line_id(line):
+    # The ID is the first column of a raw CSV record and is never quoted
+    return line.split(b",", 1)[0].strip().decode("utf-8")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(csv_filename=DEFAULT_CSV_FILENAME):
+    """Return the process-wide store for a CSV file, opening it on first use."""
+    key = os.path.abspath(csv_filename)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = EmissionsStore(csv_filename)
+        return store
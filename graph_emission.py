@@ -1,56 +1,274 @@
+import io
+import threading
+
 import matplotlib.pyplot as plt
-import csv
+import numpy as np
 from matplotlib import rcParams
+from emissions_dataset import get_dataset, EMISSION_FIELDS, ENERGY_FIELDS, TRANSPORTATION_FIELDS
+from instrumentation import timed
 
 # Set font properties globally
 rcParams['font.family'] = 'Arial'
 rcParams['font.size'] = 12
 
-def generate_and_show_graph():
-    companies = []
-    energy_sum = []
-    transportation_sum = []
-
-    # Load data from the CSV file
-    with open('emissions_data.csv', 'r') as csvfile:
-        data = csv.reader(csvfile, delimiter=',')
-
-        # Skip the header row
-        next(data)
-
-        for row in data:
-            companies.append(row[1])  # Company Name
-            # Calculate total energy emissions for each company
-            total_energy_emissions = round(sum(float(row[i]) for i in range(7, len(row))), 2)
-            energy_sum.append(total_energy_emissions)
-            # Calculate total transportation emissions for each company
-            total_transportation_emissions = round(sum(float(row[i]) for i in range(3, 7)), 2)
-            transportation_sum.append(total_transportation_emissions)
-
-    # Find the top 10 companies by total emissions
-    top_10_indices = sorted(range(len(energy_sum)), key=lambda i: energy_sum[i] + transportation_sum[i], reverse=True)[:10]
-    top_10_companies = [companies[i] for i in top_10_indices]
-    top_10_energy_sum = [energy_sum[i] for i in top_10_indices]
-    top_10_transportation_sum = [transportation_sum[i] for i in top_10_indices]
-
-    # Plotting code for the top 10 companies
-    fig, ax = plt.subplots()
-    x = range(len(top_10_companies))
-    bar_width = 0.35
-
-    ax.bar(x, top_10_energy_sum, color='b', width=bar_width, label='Energy Emissions')
-    ax.bar([i + bar_width for i in x], top_10_transportation_sum, color='r', width=bar_width, label='Transportation Emissions')
-
-    ax.set_xlabel('Company Name')
-    ax.set_ylabel('Total Emissions (kg CO2)')
-    ax.set_title('Total Emissions by Top 10 Companies')
-    ax.set_xticks([i + bar_width / 2 for i in x])
-    ax.set_xticklabels(top_10_companies, rotation=45, ha='right')
-    ax.legend()
-
-    # Annotate each bar with its value
-    for i in x:
-        ax.text(i, top_10_energy_sum[i], str(top_10_energy_sum[i]), ha='center', va='bottom')
-        ax.text(i + bar_width, top_10_transportation_sum[i], str(top_10_transportation_sum[i]), ha='center', va='bottom')
+BAR_WIDTH = 0.35
+
+@timed()
+def top_companies_data(top_n=10):
+    """Return (companies, energy sums, transportation sums) of the top N companies and the data version."""
+    # Find the top N companies by total emissions (vectorized totals, partial selection)
+    dataset = get_dataset('emissions_data.csv')
+    with dataset.lock:
+        top_indices = dataset.top_n(top_n)
+        top_companies = dataset.names[top_indices].tolist()
+        top_energy_sum = dataset.energy_totals[top_indices].round(2).tolist()
+        top_transportation_sum = dataset.transportation_totals[top_indices].round(2).tolist()
+        return (top_companies, top_energy_sum, top_transportation_sum), dataset.version
+
+class TopCompaniesGraph:
+    """
+    Top N bar chart drawn on a persistent figure.
+
+    update() re-reads the shared dataset and, only if its version changed,
+    sets the bar heights, tick labels and annotations in place instead of
+    building a new figure.
+    """
+
+    def __init__(self, fig, top_n=10):
+        self.fig = fig
+        self.top_n = top_n
+        self.ax = fig.add_subplot()
+        self.version = None
+        self.energy_bars = []
+        self.transportation_bars = []
+        self.energy_labels = []
+        self.transportation_labels = []
+        self.update()
+
+    @timed()
+    def update(self):
+        """Refresh the chart from the dataset. Returns True if anything was redrawn."""
+        data, version = top_companies_data(self.top_n)
+        if version == self.version:
+            return False
+        top_companies, top_energy_sum, top_transportation_sum = data
+        if len(top_companies) == len(self.energy_bars):
+            self._update_in_place(top_companies, top_energy_sum, top_transportation_sum)
+        else:
+            # The number of bars changed (small dataset), lay the axes out again
+            self._draw(top_companies, top_energy_sum, top_transportation_sum)
+        self.version = version
+        return True
+
+    def _update_in_place(self, top_companies, top_energy_sum, top_transportation_sum):
+        for bar, label, value in zip(self.energy_bars, self.energy_labels, top_energy_sum):
+            bar.set_height(value)
+            label.set_y(value)
+            label.set_text(str(value))
+        for bar, label, value in zip(self.transportation_bars, self.transportation_labels, top_transportation_sum):
+            bar.set_height(value)
+            label.set_y(value)
+            label.set_text(str(value))
+        self.ax.set_xticklabels(top_companies, rotation=45, ha='right')
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+    def _draw(self, top_companies, top_energy_sum, top_transportation_sum):
+        # Plotting code for the top N companies
+        ax = self.ax
+        ax.clear()
+        x = range(len(top_companies))
+
+        self.energy_bars = ax.bar(x, top_energy_sum, color='b', width=BAR_WIDTH, label='Energy Emissions').patches
+        self.transportation_bars = ax.bar([i + BAR_WIDTH for i in x], top_transportation_sum, color='r', width=BAR_WIDTH, label='Transportation Emissions').patches
 
+        ax.set_xlabel('Company Name')
+        ax.set_ylabel('Total Emissions (kg CO2)')
+        ax.set_title(f'Total Emissions by Top {len(top_companies)} Companies')
+        ax.set_xticks([i + BAR_WIDTH / 2 for i in x])
+        ax.set_xticklabels(top_companies, rotation=45, ha='right')
+        ax.legend()
+
+        # Annotate each bar with its value
+        self.energy_labels = [ax.text(i, top_energy_sum[i], str(top_energy_sum[i]), ha='center', va='bottom') for i in x]
+        self.transportation_labels = [ax.text(i + BAR_WIDTH, top_transportation_sum[i], str(top_transportation_sum[i]), ha='center', va='bottom') for i in x]
+
+@timed()
+def generate_and_show_graph(top_n=10):
+    fig = plt.figure()
+    TopCompaniesGraph(fig, top_n)
     return fig
+
+# Distribution charts for large datasets: the companies are binned with vectorized
+# numpy code first, so what is drawn has a fixed size (bins, not points) and takes
+# the same time for a hundred companies as for millions.
+CHART_MODES = {
+    "top": "Top 10 Companies",
+    "histogram": "Total Emissions Histogram",
+    "heatmap": "Energy vs Transportation",
+    "breakdown": "Emissions by Source",
+}
+HISTOGRAM_BINS = 60
+HEATMAP_BINS = 80
+# The heatmap axes end at this percentile so a few outliers do not squeeze
+# everyone else into one corner; larger values are counted in the last bin
+HEATMAP_PERCENTILE = 99.9
+
+_binned = {}
+_rendered = {}
+_cache_lock = threading.Lock()
+
+
+def _bin_indices(values, low, high, bins):
+    # Bin number of every value on equal-width bins over [low, high], clipped to the edge bins
+    if high <= low:
+        return np.zeros(len(values), dtype=np.intp)
+    indices = ((values - low) * (bins / (high - low))).astype(np.intp)
+    return np.clip(indices, 0, bins - 1)
+
+
+def _histogram(totals):
+    # Log-spaced bins: totals are heavy-tailed, so equal-width bins would put
+    # nearly every company into the first one. Zero totals are counted apart.
+    positive = totals[totals > 0]
+    if len(positive) == 0:
+        return {"edges": np.array([0.0, 1.0]), "counts": np.zeros(1, dtype=np.int64), "zeros": len(totals)}
+    low, high = np.log10(positive.min()), np.log10(positive.max())
+    counts = np.bincount(_bin_indices(np.log10(positive), low, high, HISTOGRAM_BINS), minlength=HISTOGRAM_BINS)
+    edges = np.logspace(low, high if high > low else low + 1, HISTOGRAM_BINS + 1)
+    return {"edges": edges, "counts": counts, "zeros": len(totals) - len(positive)}
+
+
+def _heatmap(transportation, energy):
+    x_high = float(np.percentile(transportation, HEATMAP_PERCENTILE)) if len(transportation) else 0.0
+    y_high = float(np.percentile(energy, HEATMAP_PERCENTILE)) if len(energy) else 0.0
+    x_high, y_high = x_high or 1.0, y_high or 1.0
+    cells = (_bin_indices(energy, 0.0, y_high, HEATMAP_BINS) * HEATMAP_BINS
+             + _bin_indices(transportation, 0.0, x_high, HEATMAP_BINS))
+    counts = np.bincount(cells, minlength=HEATMAP_BINS * HEATMAP_BINS).reshape(HEATMAP_BINS, HEATMAP_BINS)
+    return {"counts": counts, "extent": (0.0, x_high, 0.0, y_high)}
+
+
+@timed()
+def chart_data(mode):
+    """
+    Return the binned data of a distribution chart and the data version it was
+    computed from; recomputed only when the dataset changed.
+    """
+    dataset = get_dataset('emissions_data.csv')
+    with dataset.lock:
+        version = dataset.version
+        with _cache_lock:
+            cached = _binned.get(mode)
+        if cached is not None and cached[0] == version:
+            return cached[1], version
+        if mode == "histogram":
+            data = _histogram(dataset.totals)
+        elif mode == "heatmap":
+            data = _heatmap(dataset.transportation_totals, dataset.energy_totals)
+        elif mode == "breakdown":
+            data = {"sums": np.nan_to_num(dataset.values).sum(axis=0)}
+        else:
+            raise ValueError(f"Unknown chart mode: {mode}")
+        data["companies"] = len(dataset)
+    with _cache_lock:
+        _binned[mode] = (version, data)
+    return data, version
+
+
+class DistributionGraph:
+    """
+    Histogram, heatmap or per-source chart drawn on a persistent figure.
+
+    Has the same update() as TopCompaniesGraph: the figure is only redrawn
+    when the data version changed since the last draw.
+    """
+
+    def __init__(self, fig, mode):
+        self.fig = fig
+        self.mode = mode
+        self.ax = fig.add_subplot()
+        self.colorbar = None
+        self.version = None
+        self.update()
+
+    @timed()
+    def update(self):
+        """Refresh the chart from the dataset. Returns True if anything was redrawn."""
+        data, version = chart_data(self.mode)
+        if version == self.version:
+            return False
+        if self.colorbar is not None:
+            self.colorbar.remove()
+            self.colorbar = None
+        self.ax.clear()
+        getattr(self, f"_draw_{self.mode}")(data)
+        self.version = version
+        return True
+
+    def _draw_histogram(self, data):
+        ax = self.ax
+        edges = data["edges"]
+        ax.bar(edges[:-1], data["counts"], width=np.diff(edges), align='edge', color='g', edgecolor='w')
+        ax.set_xscale('log')
+        ax.set_xlabel('Total Emissions (kg CO2)')
+        ax.set_ylabel('Companies')
+        title = f'Total Emissions of {data["companies"]} Companies'
+        if data["zeros"]:
+            title += f' ({data["zeros"]} with none)'
+        ax.set_title(title)
+
+    def _draw_heatmap(self, data):
+        from matplotlib.colors import LogNorm
+
+        ax = self.ax
+        counts = np.ma.masked_equal(data["counts"], 0)
+        image = ax.imshow(counts, origin='lower', extent=data["extent"], aspect='auto',
+                          norm=LogNorm() if counts.count() else None, cmap='viridis', interpolation='nearest')
+        self.colorbar = self.fig.colorbar(image, ax=ax, label='Companies')
+        ax.set_xlabel('Transportation Emissions (kg CO2)')
+        ax.set_ylabel('Energy Emissions (kg CO2)')
+        ax.set_title(f'Energy vs Transportation Emissions of {data["companies"]} Companies')
+
+    def _draw_breakdown(self, data):
+        ax = self.ax
+        sums = data["sums"]
+        colors = ['r'] * len(TRANSPORTATION_FIELDS) + ['b'] * len(ENERGY_FIELDS)
+        ax.barh(range(len(EMISSION_FIELDS)), sums, color=colors)
+        ax.set_yticks(range(len(EMISSION_FIELDS)))
+        ax.set_yticklabels(EMISSION_FIELDS)
+        ax.invert_yaxis()
+        ax.set_xlabel('Total Emissions (kg CO2)')
+        ax.set_title(f'Emissions by Source across {data["companies"]} Companies')
+
+
+def make_graph(fig, mode="top"):
+    """Return the chart of the given CHART_MODES mode, drawn on fig."""
+    if mode == "top":
+        return TopCompaniesGraph(fig)
+    if mode not in CHART_MODES:
+        raise ValueError(f"Unknown chart mode: {mode}")
+    return DistributionGraph(fig, mode)
+
+
+@timed()
+def render_chart(mode, fmt="png"):
+    """
+    Return a chart rendered to image bytes, reusing the last rendering of the
+    mode while the data version is unchanged.
+    """
+    from matplotlib.figure import Figure
+
+    dataset = get_dataset('emissions_data.csv')
+    with _cache_lock:
+        cached = _rendered.get((mode, fmt))
+    if cached is not None and cached[0] == dataset.version:
+        return cached[1]
+    # A standalone Figure (not pyplot) so it can be rendered off the Tk thread
+    fig = Figure(figsize=(10, 6), layout='tight')
+    graph = make_graph(fig, mode)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt)
+    with _cache_lock:
+        _rendered[(mode, fmt)] = (graph.version, buffer.getvalue())
+    return buffer.getvalue()
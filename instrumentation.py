@@ -0,0 +1,174 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+# Latency histogram bucket upper bounds in seconds (the last bucket is +Inf)
+BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+_enabled = os.environ.get("GOGREEN_METRICS", "") not in ("", "0")
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, plus count, sum and max."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + [self.max], self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    """Start collecting metrics."""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Stop collecting metrics; already collected values are kept."""
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """Forget every collected metric."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def observe(name, seconds):
+    """Record one latency sample for a named operation."""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+def increment(name, amount=1):
+    """Add to a named counter."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def timed(name=None):
+    """
+    Decorator timing every call of a function into a latency histogram.
+
+    While metrics are disabled the wrapper only checks a module flag before
+    calling through, so it can stay on hot paths permanently. Calls that
+    raise are counted in '<name>.errors'.
+    """
+    def decorator(func):
+        metric = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                increment(metric + ".errors")
+                raise
+            finally:
+                observe(metric, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class timer:
+    """Context manager timing a block into a latency histogram."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter() if _enabled else None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            observe(self.name, time.perf_counter() - self.start)
+
+
+def snapshot():
+    """
+    Return the collected metrics as plain data.
+
+    Returns:
+        dict: ``latency`` maps operation names to count, sum, mean, p50, p95, p99, max and
+            per-bucket counts (seconds); ``counters`` maps counter names to values.
+    """
+    with _lock:
+        latency = {}
+        for name, histogram in sorted(_histograms.items()):
+            latency[name] = {
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95),
+                "p99": histogram.quantile(0.99),
+                "max": histogram.max,
+                "buckets": dict(zip([str(bound) for bound in BUCKETS] + ["+Inf"], histogram.buckets)),
+            }
+        return {"enabled": _enabled, "latency": latency, "counters": dict(sorted(_counters.items()))}
+
+
+def export_json():
+    """Return the metrics snapshot as a JSON document."""
+    return json.dumps(snapshot(), indent=2)
+
+
+def export_prometheus():
+    """Return the metrics in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = ["# HELP gogreen_latency_seconds Latency of instrumented operations.",
+             "# TYPE gogreen_latency_seconds histogram"]
+    for name, stats in data["latency"].items():
+        cumulative = 0
+        for bound, count in stats["buckets"].items():
+            cumulative += count
+            lines.append(f'gogreen_latency_seconds_bucket{{operation="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'gogreen_latency_seconds_sum{{operation="{name}"}} {stats["sum"]}')
+        lines.append(f'gogreen_latency_seconds_count{{operation="{name}"}} {stats["count"]}')
+    lines += ["# HELP gogreen_events_total Instrumented event counters.",
+              "# TYPE gogreen_events_total counter"]
+    for name, value in data["counters"].items():
+        lines.append(f'gogreen_events_total{{name="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
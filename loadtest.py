@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+# Load test for the local HTTP API (server.py), using keep-alive connections:
+#   python server.py --port 8080 &
+#   python loadtest.py --port 8080 --connections 50 --requests 20000 --write-ratio 0.05
+
+async def request(reader, writer, method, path, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+async def client(host, port, requests, ids, write_ratio, new_ids, added, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            roll = random.random()
+            if roll < write_ratio and new_ids:
+                # Writes: add new companies and delete those added earlier, so the dataset keeps its size
+                company_id = new_ids.pop()
+                data = {"ID": company_id, "Name": f"Load Test {company_id}", "Car": "10", "Bus": "5", "Train": "1",
+                        "Bicycle": "0", "Walking": "0", "Electricity": "900", "Natural Gas": "40",
+                        "Fuel Oil": "0", "Propane": "0", "Coal": "0"}
+                method, path, body = "POST", "/companies", data
+            elif roll < 2 * write_ratio and added:
+                method, path, body = "DELETE", f"/companies/{added.pop()}", None
+            elif roll < 0.9:
+                method, path, body = "GET", f"/companies/{random.choice(ids)}", None
+            elif roll < 0.95:
+                method, path, body = "GET", f"/companies?offset={random.randrange(len(ids))}&limit=50", None
+            else:
+                method, path, body = "GET", "/top?n=10", None
+            start = time.perf_counter()
+            status = await request(reader, writer, method, path, body)
+            latencies.setdefault(method, []).append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if method == "POST" and status == 201:
+                added.append(company_id)
+    finally:
+        writer.close()
+
+async def fetch_ids(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"GET /companies HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    data = json.loads(response.split(b"\r\n\r\n", 1)[1])
+    return [company["ID"] for company in data]
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+async def run(args):
+    ids = await fetch_ids(args.host, args.port)
+    if not ids:
+        print("The server has no companies to read.", file=sys.stderr)
+        return 1
+    # Four-digit IDs not stored yet, for the add requests
+    stored = set(ids)
+    new_ids = [f"{i:04d}" for i in range(10000) if f"{i:04d}" not in stored]
+    random.shuffle(new_ids)
+    latencies, statuses, added = {}, {}, []
+    per_client = args.requests // args.connections
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args.host, args.port, per_client, ids, args.write_ratio, new_ids, added, latencies, statuses)
+                           for _ in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    total = sum(statuses.values())
+    print(f"{total} requests over {args.connections} connections in {elapsed:.2f} s: {total / elapsed:.0f} requests/sec")
+    for method, values in sorted(latencies.items()):
+        print(f"  {method:6s} {len(values):7d}  p50 {percentile(values, 0.5) * 1000:7.2f} ms  "
+              f"p95 {percentile(values, 0.95) * 1000:7.2f} ms  p99 {percentile(values, 0.99) * 1000:7.2f} ms")
+    print("  status codes: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    if added:
+        print(f"  {len(added)} companies added by the test are still stored", file=sys.stderr)
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure requests/sec of the local emissions HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--connections", type=int, default=50, help="concurrent keep-alive connections")
+    parser.add_argument("--requests", type=int, default=10000, help="total number of requests")
+    parser.add_argument("--write-ratio", type=float, default=0.0,
+                        help="share of requests that add a company, the same share deletes one (default 0: reads only)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
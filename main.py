@@ -1,10 +1,26 @@
+import time
+STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import sys
 import utils
-from graph_emission import generate_and_show_graph
+from report_worker import get_report_worker
+from report_cache import list_reports
 import os
 import shutil
+import instrumentation
+from instrumentation import timed
+
+# Height in pixels of an Index Data row; the treeview only holds the rows that fit in view
+INDEX_ROW_HEIGHT = 30
+# Rows moved per mouse wheel notch in the Index Data tab
+INDEX_WHEEL_ROWS = 3
+# Seconds from starting main.py until the window is shown (matplotlib, pandas and the
+# CSV are only loaded once a tab needs them; see benchmark.py gui_cold_start)
+STARTUP_BUDGET = 0.5
+# Name suggestions shown under a search box
+SEARCH_SUGGESTIONS = 8
 
 class CustomApplication(tk.Frame):
     def __init__(self, *args, **kwargs):
@@ -41,24 +57,26 @@ class EmissionsDataApp(CustomApplication):
         self.notebook = ttk.Notebook(master)
         self.notebook.pack(expand=True, fill=tk.BOTH)
 
-        # Add tabs for different sections
-        self.add_data_tab()
-        self.retrieve_data_tab()
-        self.delete_data_tab()
-        self.show_graph_data_tab()
-        self.show_index_data_tab()
-        self.pdf_data_tab()
-
-        # Apply default font to all widgets
-        self.apply_default_font(master)
+        # Add tabs for different sections. Only empty frames are added here; each
+        # tab's widgets are built when it is first selected (see refresh_data)
+        self.tab_builders = [self.add_data_tab, self.retrieve_data_tab, self.delete_data_tab,
+                             self.show_graph_data_tab, self.show_index_data_tab, self.pdf_data_tab,
+                             self.diagnostics_tab]
+        self.tabs = []
+        for title in ('Add Data', 'Retrieve Data', 'Delete Data', 'Graph Data', 'Index Data', 'PDF Data', 'Diagnostics'):
+            tab = ttk.Frame(self.notebook)
+            self.notebook.add(tab, text=title)
+            self.tabs.append(tab)
+        self.built_tabs = set()
+        self.build_tab(0)
 
         self.notebook.bind("<<NotebookTabChanged>>", self.refresh_data)
 
-    def add_data_tab(self):
-        # Tab for adding emissions data
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text='Add Data')
+        # Poll the background report worker for finished PDF reports
+        self.poll_reports()
 
+    def add_data_tab(self, tab):
+        # Tab for adding emissions data
         # Company ID entry
         company_id_label = tk.Label(tab, text="Company ID:")
         company_id_label.grid(row=0, column=0, padx=5, pady=5)
@@ -97,21 +115,27 @@ class EmissionsDataApp(CustomApplication):
             entry.grid(row=j, column=1, padx=5, pady=5)
             self.energy_entries.append(entry)
 
+        # Optional month: records the values as that month's reading of an existing company
+        month_label = tk.Label(tab, text="Month (YYYY-MM, optional):")
+        month_label.grid(row=14, column=0, padx=5, pady=5)
+        self.month_entry = tk.Entry(tab)
+        self.month_entry.grid(row=14, column=1, padx=5, pady=5)
+
         # Add Emissions Data button
         add_button = tk.Button(tab, text="Add Emissions Data", command=self.add_data)
-        add_button.grid(row=14, column=0, columnspan=2, padx=5, pady=5)
+        add_button.grid(row=15, column=0, columnspan=2, padx=5, pady=5)
 
-    def retrieve_data_tab(self):
+    def retrieve_data_tab(self, tab):
         # Tab for retrieving emissions data
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text='Retrieve Data')
-
         # Company ID entry
         company_id_label = tk.Label(tab, text="Company ID:")
         company_id_label.grid(row=1, column=0, padx=5, pady=5)
         self.retrieve_company_id_entry = tk.Entry(tab)
         self.retrieve_company_id_entry.grid(row=1, column=1, padx=5, pady=5)
 
+        # Search by company name; picking a suggestion fills in the ID
+        self.name_search_box(tab, self.retrieve_company_id_entry).grid(row=0, column=0, columnspan=2, padx=5, pady=5)
+
         # Retrieve Data button
         retrieve_button = tk.Button(tab, text="Retrieve Data", command=self.display_retrieved_data)
         retrieve_button.grid(row=2, column=0, columnspan=2, padx=5, pady=5)
@@ -128,11 +152,8 @@ class EmissionsDataApp(CustomApplication):
         self.reports_text = tk.Text(self.report_frame, wrap="word", height=10, width=80)
         self.reports_text.grid(row=0, column=0, padx=5, pady=5)
 
-    def delete_data_tab(self):
+    def delete_data_tab(self, tab):
         # Tab for deleting emissions data
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text='Delete Data')
-
         # Company ID entry
         company_id_label = tk.Label(tab, text="Company ID:")
         company_id_label.grid(row=0, column=0, padx=5, pady=5)
@@ -143,23 +164,57 @@ class EmissionsDataApp(CustomApplication):
         delete_button = tk.Button(tab, text="Delete Data", command=self.delete_data)
         delete_button.grid(row=1, column=0, columnspan=2, padx=5, pady=5)
 
-    def show_graph_data_tab(self, event=None):
-        # Tab for displaying graph data
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text='Graph Data')
-
-        
-        # Generate and display the graph in the tab
-        graph = generate_and_show_graph()  # Call the function to generate the graph
-        canvas = FigureCanvasTkAgg(graph, master=tab)
-        canvas.draw()
-        canvas.get_tk_widget().pack(expand=True, fill=tk.BOTH)
+        # Search by company name; picking a suggestion fills in the ID
+        self.name_search_box(tab, self.delete_company_id_entry).grid(row=2, column=0, columnspan=2, padx=5, pady=5)
+
+    def name_search_box(self, parent, id_entry):
+        # Name entry with suggestions updated as the user types; selecting one copies its ID to id_entry
+        frame = ttk.Frame(parent)
+        tk.Label(frame, text="Search by Name:").grid(row=0, column=0, padx=5, pady=5)
+        query_entry = tk.Entry(frame)
+        query_entry.grid(row=0, column=1, padx=5, pady=5)
+        suggestions = tk.Listbox(frame, height=SEARCH_SUGGESTIONS, width=50)
+        suggestions.grid(row=1, column=0, columnspan=2, padx=5, pady=5)
+        matches = []
+
+        def update_suggestions(event=None):
+            try:
+                matches[:] = utils.search_companies(query_entry.get(), SEARCH_SUGGESTIONS)
+            except Exception as e:
+                messagebox.showerror("Error", f"Error occurred: {e}")
+                return
+            suggestions.delete(0, tk.END)
+            for company_id, company_name in matches:
+                suggestions.insert(tk.END, f"{company_id}  {company_name}")
+
+        def use_suggestion(event=None):
+            selection = suggestions.curselection()
+            if selection:
+                id_entry.delete(0, tk.END)
+                id_entry.insert(0, matches[selection[0]][0])
+
+        query_entry.bind("<KeyRelease>", update_suggestions)
+        suggestions.bind("<<ListboxSelect>>", use_suggestion)
+        return frame
+
+    def show_graph_data_tab(self, tab):
+        # Tab for displaying graph data; matplotlib is only imported once it is first shown
+        from graph_emission import CHART_MODES
+
+        # Chart selector; the selected chart is created by refresh_graph_data
+        self.graph_mode = tk.StringVar(value="top")
+        selector = tk.Frame(tab)
+        selector.pack(fill=tk.X)
+        for mode, title in CHART_MODES.items():
+            tk.Radiobutton(selector, text=title, variable=self.graph_mode, value=mode,
+                           command=self.refresh_graph_data).pack(side=tk.LEFT, padx=5)
+        self.graph_area = tk.Frame(tab)
+        self.graph_area.pack(expand=True, fill=tk.BOTH)
+        self.graphs = {}
+        self.graph_shown = None
     
-    def show_index_data_tab(self):
+    def show_index_data_tab(self, tab):
         # Tab for displaying index data
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text='Index Data')
-
         # Create a treeview widget
         self.tree = ttk.Treeview(tab, columns=("Company ID", "Company Name"), show="headings")
         self.tree.heading("Company ID", text="Company ID")
@@ -169,7 +224,7 @@ class EmissionsDataApp(CustomApplication):
         # Apply font, center alignment, and row height to the treeview
         style = ttk.Style()
         style.configure("Treeview.Heading", font=("Arial", 18), anchor="center")
-        style.configure("Treeview", font=("Arial", 18), rowheight=30)
+        style.configure("Treeview", font=("Arial", 18), rowheight=INDEX_ROW_HEIGHT)
 
         # Set up the background color of all cells to blue
         style.map("Treeview", background=[("selected", "blue")])
@@ -179,47 +234,90 @@ class EmissionsDataApp(CustomApplication):
         #style.layout("Treeview", [('Treeview.treearea', {'sticky': 'nswe'})])  # Remove cell borders
         #style.layout("Treeview.Heading", [('Treeview.heading.treearea', {'sticky': 'nswe'})])  # Remove header borders
 
+        # Scrollbar over all the companies; the treeview keeps a fixed window of items,
+        # the rows that fit in view, which are refilled as the scroll offset moves
+        self.index_scrollbar = ttk.Scrollbar(tab, orient=tk.VERTICAL, command=self.on_index_scroll)
+        self.index_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.tree.pack(fill=tk.BOTH, expand=True)
-
-        # Sample data (replace with your actual data)
-        data = [
-            ("1", "Company A"),
-            ("2", "Company B"),
-            ("3", "Company C")
-        ]
-
-        # Insert data into the treeview
-        for item in data:
-            self.tree.insert("", tk.END, values=item)
-
-    def pdf_data_tab(self):
+        self.tree.bind("<Configure>", self.on_index_resize)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self.on_index_wheel)
+        for sequence in ("<Up>", "<Down>"):
+            self.tree.bind(sequence, self.on_index_key)
+        self.index_total = 0
+        self.index_offset = 0
+        self.index_rows = 20
+
+    def pdf_data_tab(self, tab):
         # Tab for displaying PDF data
-        tab = ttk.Frame(self.notebook)
-        self.notebook.add(tab, text='PDF Data')
-
         # Create a Listbox widget to display available PDF reports
+        # Filled by refresh_pdf_data whenever the tab is selected
         self.reports_listbox = tk.Listbox(tab, selectmode=tk.SINGLE)
         self.reports_listbox.pack(fill=tk.BOTH, expand=True)
 
-        # Populate the Listbox with available PDF reports
-        reports_directory = 'reports'  # Update with your directory containing PDF files
-        
-        # Get a list of tuples containing (filename, creation_time)
-        files_with_time = [(filename, os.path.getctime(os.path.join(reports_directory, filename))) 
-                            for filename in os.listdir(reports_directory) 
-                            if filename.endswith('.pdf')]
-        
-        # Sort the list of files by creation time in descending order
-        sorted_files = sorted(files_with_time, key=lambda x: x[1], reverse=True)
-        
-        # Add the sorted filenames to the Listbox
-        for filename, _ in sorted_files:
-            self.reports_listbox.insert(tk.END, filename)
-
         # Create a button to download the selected file
         download_button = tk.Button(tab, text="Download Selected", command=self.download_selected)
         download_button.pack()
 
+    def diagnostics_tab(self, tab):
+        # Tab for displaying latency and counter metrics of the hot paths
+        # Controls: switch collection on/off, refresh, reset and export
+        controls = ttk.Frame(tab)
+        controls.pack(fill=tk.X)
+        self.metrics_enabled = tk.BooleanVar(value=instrumentation.is_enabled())
+        tk.Checkbutton(controls, text="Collect metrics", variable=self.metrics_enabled,
+                       command=self.toggle_metrics).pack(side=tk.LEFT, padx=5, pady=5)
+        tk.Button(controls, text="Refresh", command=self.refresh_diagnostics).pack(side=tk.LEFT, padx=5, pady=5)
+        tk.Button(controls, text="Reset", command=self.reset_metrics).pack(side=tk.LEFT, padx=5, pady=5)
+        tk.Button(controls, text="Export JSON", command=lambda: self.export_metrics("json")).pack(side=tk.LEFT, padx=5, pady=5)
+        tk.Button(controls, text="Export Prometheus", command=lambda: self.export_metrics("prom")).pack(side=tk.LEFT, padx=5, pady=5)
+
+        # One row per instrumented operation (latencies in milliseconds) and per counter
+        columns = ("Operation", "Calls", "Mean", "p50", "p95", "p99", "Max")
+        self.metrics_tree = ttk.Treeview(tab, columns=columns, show="headings")
+        for column in columns:
+            self.metrics_tree.heading(column, text=column if column in ("Operation", "Calls") else f"{column} (ms)")
+            self.metrics_tree.column(column, width=400 if column == "Operation" else 120, anchor="w" if column == "Operation" else "e")
+        self.metrics_tree.pack(fill=tk.BOTH, expand=True)
+
+    def toggle_metrics(self):
+        if self.metrics_enabled.get():
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+
+    def reset_metrics(self):
+        instrumentation.reset()
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self, event=None):
+        # Show the current metrics snapshot
+        self.metrics_tree.delete(*self.metrics_tree.get_children())
+        metrics = instrumentation.snapshot()
+        for name, stats in metrics["latency"].items():
+            self.metrics_tree.insert("", tk.END, values=(name, stats["count"]) + tuple(
+                f"{stats[key] * 1000:.2f}" for key in ("mean", "p50", "p95", "p99", "max")))
+        for name, value in metrics["counters"].items():
+            self.metrics_tree.insert("", tk.END, values=(name, value, "", "", "", "", ""))
+
+    def export_metrics(self, fmt):
+        # Save the metrics as JSON or Prometheus text
+        if fmt == "json":
+            filename = filedialog.asksaveasfilename(title="Export Metrics", defaultextension=".json",
+                                                    filetypes=[("JSON", "*.json")])
+            content = instrumentation.export_json()
+        else:
+            filename = filedialog.asksaveasfilename(title="Export Metrics", defaultextension=".prom",
+                                                    filetypes=[("Prometheus text", "*.prom *.txt")])
+            content = instrumentation.export_prometheus()
+        if filename:
+            try:
+                with open(filename, "w") as file:
+                    file.write(content)
+                messagebox.showinfo("Export Successful", f"Metrics exported to {filename}.")
+            except OSError as e:
+                messagebox.showerror("Export Error", f"An error occurred while exporting: {e}")
+
     def download_selected(self):
         # Get the selected PDF filename
         selected_index = self.reports_listbox.curselection()
@@ -242,7 +340,8 @@ class EmissionsDataApp(CustomApplication):
         # Functionality to add emissions data
         company_id = self.company_id_entry.get()
         company_name = self.company_name_entry.get()
-        if not company_id or not company_name:
+        month = self.month_entry.get().strip()
+        if not company_id or not (company_name or month):
             messagebox.showerror("Error", "Company ID and Company Name are required.")
             return
 
@@ -256,7 +355,24 @@ class EmissionsDataApp(CustomApplication):
         data.update({method: value for method, value in zip(['Car', 'Bus', 'Train', 'Bicycle', 'Walking'], transportation_data)})
         data.update({source: value for source, value in zip(['Electricity', 'Natural Gas', 'Fuel Oil', 'Propane', 'Coal'], energy_data)})
 
-        utils.store_emissions_data(data)
+        if month:
+            # Time-series mode: a dated monthly reading for an existing company
+            data['Month'] = month
+            utils.store_monthly_record(data)
+            return
+        utils.store_emissions_data(data, on_report_done=self.report_done)
+
+    def poll_reports(self):
+        # Run completion callbacks of finished background reports without blocking the GUI
+        get_report_worker().poll()
+        self.master.after(250, self.poll_reports)
+
+    def report_done(self, error):
+        # Called on the Tk thread once the background PDF report is finished
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to generate the pdf report: {error}")
+        elif self.notebook.tab(self.notebook.index("current"), "text") == 'PDF Data':
+            self.refresh_pdf_data()
     
     def delete_data(self):
         # Functionality to delete emissions data
@@ -276,9 +392,20 @@ class EmissionsDataApp(CustomApplication):
         self.reports_text.delete(1.0, tk.END)  # Clear previous content
         self.reports_text.insert(tk.END, report_data)
 
+    def build_tab(self, index):
+        # Build a tab's widgets the first time it is selected
+        if index not in self.built_tabs:
+            with instrumentation.timer("gui.build_tab." + self.notebook.tab(index, "text")):
+                self.tab_builders[index](self.tabs[index])
+                # Apply default font to the new widgets
+                self.apply_default_font(self.tabs[index])
+            self.built_tabs.add(index)
+
+    @timed()
     def refresh_data(self, event=None):
         # Call the appropriate refresh method based on the selected tab
         selected_tab = self.notebook.index("current")
+        self.build_tab(selected_tab)
         if selected_tab == 0:  # Add Data tab
             pass  # No refresh needed for Add Data tab
         elif selected_tab == 1:  # Retrieve Data tab
@@ -291,69 +418,144 @@ class EmissionsDataApp(CustomApplication):
             self.refresh_index_data()
         elif selected_tab == 5:  # Pdf Data tab
             self.refresh_pdf_data()
+        elif selected_tab == 6:  # Diagnostics tab
+            self.refresh_diagnostics()
 
+    @timed()
     def refresh_graph_data(self, event=None):
-        # Refresh the graph when switching to the "Graph Data" tab
-        tab_index = self.notebook.index("current")
-        tab_text = self.notebook.tab(tab_index, "text")
-        if tab_text == 'Graph Data':
-            tab = self.notebook.winfo_children()[tab_index]
-            for widget in tab.winfo_children():
-                widget.destroy()
-            # Generate and display the graph in the tab
-            graph = generate_and_show_graph()  # Call the function to generate the graph
-            canvas = FigureCanvasTkAgg(graph, master=tab)
+        # Refresh the selected chart when switching to the "Graph Data" tab or chart mode.
+        # Every chart keeps its own persistent figure and canvas, so switching back to one
+        # shows its last rendering and it is only redrawn if the data changed.
+        mode = self.graph_mode.get()
+        if mode not in self.graphs:
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            from matplotlib.figure import Figure
+            from graph_emission import make_graph
+
+            graph = make_graph(Figure(), mode)
+            canvas = FigureCanvasTkAgg(graph.fig, master=self.graph_area)
             canvas.draw()
+            self.graphs[mode] = (graph, canvas)
+        else:
+            graph, canvas = self.graphs[mode]
+            if graph.update():
+                canvas.draw_idle()
+        if self.graph_shown != mode:
+            if self.graph_shown is not None:
+                self.graphs[self.graph_shown][1].get_tk_widget().pack_forget()
             canvas.get_tk_widget().pack(expand=True, fill=tk.BOTH)
+            self.graph_shown = mode
     
+    @timed()
     def refresh_index_data(self, event=None):
         # Clear existing data in the treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.tree.delete(*self.tree.get_children())
+        self.index_offset = 0
 
-        # Retrieve and parse updated data
-        companies_data_str = utils.retrieve_all_companies_data()
-        if companies_data_str.startswith("Error occurred"):
+        try:
+            self.index_total = utils.count_companies()
+        except Exception as e:
             # Handle error
-            messagebox.showerror("Error", companies_data_str)
+            messagebox.showerror("Error", f"Error occurred: {e}")
             return
-        elif companies_data_str == "No data available.":
+        if self.index_total == 0:
             # Handle case when no data is available
-            messagebox.showinfo("Information", companies_data_str)
+            messagebox.showinfo("Information", "No data available.")
             return
-        else:
-            # Split the string into lines and parse each line into a tuple
-            lines = companies_data_str.strip().split("\n")
-            # Skip the first two lines
-            data = [tuple(line.strip().split()) for line in lines[2:]]
-
-            # Insert data into the treeview
-            for company_data in data:
-                self.tree.insert("", tk.END, values=company_data)
 
+        # Insert only the rows in view; scrolling refills them
+        self.show_index_rows()
+
+    def show_index_rows(self):
+        # Fill the window of treeview items with the companies (ordered alphabetically by
+        # name) from index_offset on, reusing the items, and map the scrollbar onto all of them
+        self.index_offset = max(0, min(self.index_offset, self.index_total - self.index_rows))
+        companies = utils.list_companies(self.index_offset, self.index_rows)
+        # The selection follows the companies, not the items that show them
+        selected = {str(self.tree.item(item, "values")[0]) for item in self.tree.selection()}
+        items = list(self.tree.get_children())
+        for item, values in zip(items, companies):
+            self.tree.item(item, values=values)
+        for values in companies[len(items):]:
+            items.append(self.tree.insert("", tk.END, values=values))
+        if len(items) > len(companies):
+            self.tree.delete(*items[len(companies):])
+            del items[len(companies):]
+        self.tree.selection_set([item for item, (company_id, _) in zip(items, companies) if company_id in selected])
+        if self.index_total:
+            self.index_scrollbar.set(self.index_offset / self.index_total,
+                                     (self.index_offset + len(companies)) / self.index_total)
+
+    def scroll_index(self, rows):
+        # Move the window of the Index Data tab by a number of rows
+        if self.index_total:
+            self.index_offset += rows
+            self.show_index_rows()
+
+    def on_index_scroll(self, action, amount, unit=None):
+        # Scrollbar command: ("moveto", fraction) or ("scroll", count, "units" or "pages")
+        if action == "moveto":
+            if self.index_total:
+                self.index_offset = round(float(amount) * self.index_total)
+                self.show_index_rows()
+        else:
+            self.scroll_index(int(amount) * (self.index_rows if unit == "pages" else 1))
+
+    def on_index_wheel(self, event):
+        # Button-4/5 on X11, a signed delta on Windows and macOS
+        up = event.num == 4 or getattr(event, "delta", 0) > 0
+        self.scroll_index(-INDEX_WHEEL_ROWS if up else INDEX_WHEEL_ROWS)
+        return "break"
+
+    def on_index_key(self, event):
+        # Moving past the first or last item scrolls the window and keeps the focus at its edge
+        items = self.tree.get_children()
+        step = -1 if event.keysym == "Up" else 1
+        if not items or self.tree.focus() != items[0 if step < 0 else -1]:
+            return None
+        self.scroll_index(step)
+        edge = self.tree.get_children()[0 if step < 0 else -1]
+        self.tree.focus(edge)
+        self.tree.selection_set(edge)
+        return "break"
+
+    def on_index_resize(self, event):
+        # Keep as many items as whole rows fit below the heading
+        items = self.tree.get_children()
+        bbox = self.tree.bbox(items[0]) if items else None
+        heading = bbox[1] if bbox else INDEX_ROW_HEIGHT
+        rows = max(1, (event.height - heading) // INDEX_ROW_HEIGHT)
+        if rows != self.index_rows:
+            self.index_rows = rows
+            if self.index_total:
+                self.show_index_rows()
+
+    @timed()
     def refresh_pdf_data(self, event=None):
         # Clear existing items in the Listbox
         self.reports_listbox.delete(0, tk.END)
 
-        # Populate the Listbox with available PDF reports
-        reports_directory = 'reports'  # Update with your directory containing PDF files
-        
-        # Get a list of tuples containing (filename, creation_time)
-        files_with_time = [(filename, os.path.getctime(os.path.join(reports_directory, filename))) 
-                            for filename in os.listdir(reports_directory) 
-                            if filename.endswith('.pdf')]
-        
-        # Sort the list of files by creation time in descending order
-        sorted_files = sorted(files_with_time, key=lambda x: x[1], reverse=True)
-        
-        # Add the sorted filenames to the Listbox
-        for filename, _ in sorted_files:
+        # Populate the Listbox with available PDF reports, newest first, from the
+        # report manifest instead of stat-ing every file in the reports directory
+        for filename in list_reports():
             self.reports_listbox.insert(tk.END, filename)
 
+def report_startup(root):
+    # Record the cold-start time once the window is drawn, and warn when it is over budget
+    root.update_idletasks()
+    seconds = time.perf_counter() - STARTED
+    instrumentation.observe("gui.startup", seconds)
+    if seconds > STARTUP_BUDGET:
+        print(f"Startup took {seconds:.2f} s (budget {STARTUP_BUDGET:.2f} s)", file=sys.stderr)
+    return seconds
+
 def main():
     root = tk.Tk()
     app = EmissionsDataApp(root)
+    root.after_idle(report_startup, root)
     root.mainloop()
+    # Let a report that is still rendering finish before exiting
+    get_report_worker().shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,148 @@
+from bisect import bisect_left, insort
+
+import numpy as np
+
+# Company-name search: a sorted array of normalized names answers prefix queries
+# with a binary search, and trigram posting lists give typo-tolerant matches.
+
+# Characters of a name that take part in its trigrams
+TRIGRAM_CHARS = 32
+# Trigrams found in more than this share of all names (and at least COMMON_TRIGRAM_MIN
+# names) are too common to narrow the candidates down and are skipped, unless the
+# query has no rarer ones
+COMMON_TRIGRAM_SHARE = 0.05
+COMMON_TRIGRAM_MIN = 10000
+# Smallest trigram similarity (Jaccard) of a fuzzy match
+MIN_SIMILARITY = 0.3
+# Names added since the posting lists were built after which they are rebuilt
+DELTA_LIMIT = 10000
+
+
+def normalize(name):
+    """Return a name lowercased with its whitespace collapsed, as it is indexed."""
+    return " ".join(str(name).lower().split())
+
+
+def _trigram_codes(texts):
+    # Trigrams of normalized texts as int64 codes (21 bits per character), padded like
+    # "  text " so that the first letters weigh more; returns (codes, text numbers)
+    padded = np.array(["  " + text[:TRIGRAM_CHARS] + " " for text in texts])
+    if padded.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    chars = padded.view(np.uint32).reshape(len(padded), -1).astype(np.int64)
+    codes = (chars[:, :-2] << 42) | (chars[:, 1:-1] << 21) | chars[:, 2:]
+    valid = chars[:, 2:] != 0
+    return codes[valid], np.nonzero(valid)[0]
+
+
+class NameIndex:
+    """
+    Prefix and fuzzy search over company names, keyed by row number.
+
+    ``keys`` is a sorted list of ``(normalized name, row)``: names with a prefix
+    are one binary search away, and adds and removes are a search plus a list
+    insert or delete. For fuzzy matches, every trigram code maps to the rows
+    whose names contain it, stored as one sorted code array and a parallel row
+    array; rows added later go to a small delta dict and removed rows are
+    filtered out at query time until the next rebuild.
+    """
+
+    def __init__(self, rows=(), names=()):
+        normalized = np.array([normalize(name) for name in names], dtype=object)
+        rows = np.asarray(rows, dtype=np.int64)
+        order = np.argsort(normalized.astype(str), kind="stable") if len(rows) else rows
+        self.keys = list(zip(normalized[order].tolist(), rows[order].tolist()))
+        self._postings = None
+
+    def add(self, row, name):
+        key = (normalize(name), row)
+        insort(self.keys, key)
+        if self._postings is not None:
+            codes = set(_trigram_codes([key[0]])[0].tolist())
+            for code in codes:
+                self._delta.setdefault(code, []).append(row)
+            self._delta_counts[row] = len(codes)
+            self._removed.discard(row)
+            if len(self._delta_counts) > DELTA_LIMIT:
+                self._postings = None
+
+    def remove(self, row, name):
+        key = (normalize(name), row)
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+            if self._postings is not None:
+                self._removed.add(row)
+
+    def prefix(self, query, limit=10):
+        """Return the rows of up to limit names starting with query, in name order."""
+        query = normalize(query)
+        rows = []
+        position = bisect_left(self.keys, (query,))
+        while position < len(self.keys) and len(rows) < limit and self.keys[position][0].startswith(query):
+            rows.append(self.keys[position][1])
+            position += 1
+        return rows
+
+    def _build_postings(self):
+        names = [name for name, _ in self.keys]
+        codes, positions = _trigram_codes(names)
+        rows = np.array([row for _, row in self.keys], dtype=np.int64)
+        # Sorted by code; a trigram repeated within one name is listed twice, which
+        # only nudges that name's similarity and saves a second sort key
+        order = np.argsort(codes)
+        self._codes = codes[order]
+        self._rows = rows[positions[order]]
+        # Trigrams per row, indexed by row number
+        self._counts = np.zeros(rows.max() + 1 if len(rows) else 0, dtype=np.int64)
+        self._counts[rows] = np.bincount(positions, minlength=len(names))
+        self._delta = {}
+        self._delta_counts = {}
+        self._removed = set()
+        self._postings = True
+
+    def fuzzy(self, query, limit=10):
+        """Return the rows of up to limit names most similar to query by shared trigrams, best first."""
+        query = normalize(query)
+        if not query:
+            return []
+        if self._postings is None:
+            self._build_postings()
+        codes = np.unique(_trigram_codes([query])[0])
+        starts = np.searchsorted(self._codes, codes, side="left")
+        stops = np.searchsorted(self._codes, codes, side="right")
+        delta = [self._delta.get(code, []) for code in codes.tolist()]
+        sizes = stops - starts + np.array([len(rows) for rows in delta])
+        common = max(COMMON_TRIGRAM_MIN, COMMON_TRIGRAM_SHARE * len(self.keys))
+        use = sizes <= common
+        if not use.any():
+            use = sizes == sizes.min()
+        candidates = [self._rows[start:stop] for start, stop, used in zip(starts, stops, use) if used]
+        candidates += [np.array(rows, dtype=np.int64) for rows, used in zip(delta, use) if used]
+        if not candidates:
+            return []
+        rows, shared = np.unique(np.concatenate(candidates), return_counts=True)
+        if self._removed:
+            keep = ~np.isin(rows, list(self._removed))
+            rows, shared = rows[keep], shared[keep]
+        counts = np.zeros(len(rows), dtype=np.int64)
+        indexed = rows < len(self._counts)
+        counts[indexed] = self._counts[rows[indexed]]
+        if self._delta_counts:
+            for position in np.flatnonzero(np.isin(rows, list(self._delta_counts))).tolist():
+                counts[position] = self._delta_counts[int(rows[position])]
+        similarity = shared / (len(codes) + counts - shared)
+        matches = np.nonzero(similarity >= MIN_SIMILARITY)[0]
+        matches = matches[np.argsort(-similarity[matches], kind="stable")[:limit]]
+        return rows[matches].tolist()
+
+    def search(self, query, limit=10):
+        """Return the rows of up to limit names: prefix matches first, then fuzzy ones."""
+        rows = self.prefix(query, limit)
+        if len(rows) < limit:
+            found = set(rows)
+            rows += [row for row in self.fuzzy(query, limit) if row not in found][:limit - len(rows)]
+        return rows
+
+    def __len__(self):
+        return len(self.keys)
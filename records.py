@@ -0,0 +1,225 @@
+import numpy as np
+
+# Compact in-memory rows of the emissions table (see Records)
+
+# Longest all-digit ID packed as an integer (int64 holds 18 digits)
+MAX_PACKED_DIGITS = 18
+# Rows allocated beyond the current count when the arrays have to grow
+GROWTH_FACTOR = 1.5
+
+
+def pack_id(id_value):
+    """Return the lookup key of an ID: its packed integer, or the string itself if it does not pack."""
+    if id_value.isdigit() and len(id_value) <= MAX_PACKED_DIGITS and f"{int(id_value):04d}" == id_value:
+        return int(id_value)
+    return id_value
+
+
+def pack_ids(ids):
+    """
+    Pack a list of ID strings into an int64 array; IDs that would not format
+    back the same (not digits, or a leading zero beyond four digits) are -1
+    in the array and returned as {position: ID}.
+    """
+    if not ids:
+        return np.empty(0, dtype=np.int64), {}
+    text = np.array(ids, dtype=str)
+    packable = np.char.isdigit(text) & (np.char.str_len(text) <= MAX_PACKED_DIGITS)
+    packed = np.full(len(text), -1, dtype=np.int64)
+    packed[packable] = text[packable].astype(np.int64)
+    # Only IDs written exactly as they are formatted back ("0042", "10000") are packed
+    packable[packable] = np.char.zfill(packed[packable].astype(str), 4) == text[packable]
+    packed[~packable] = -1
+    return packed, {position: ids[position] for position in np.flatnonzero(~packable).tolist()}
+
+
+def encode_names(names):
+    """Return the UTF-8 byte pool of a list of names and their int64 offsets (one more than names)."""
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+class Records:
+    """
+    Compact, append-only storage of the rows of the emissions table.
+
+    IDs are packed into an int64 array ("0042" is stored as 42 and formatted
+    back with at least four digits); the rare ID that would not format back
+    the same is kept as a string in ``odd_ids`` by row. The ten emission
+    fields are one contiguous float64 block, and all names are UTF-8 encoded
+    into a single byte pool, row i's name spanning ``name_offsets[i]`` to
+    ``name_offsets[i + 1]``. That is about 100 bytes per row plus the name
+    itself, against several hundred for dicts or object columns of strings.
+
+    The arrays keep spare capacity, so appending rows is amortized O(rows
+    added), and arrays handed out earlier stay valid as rows are added.
+    """
+
+    def __init__(self, ids, values, name_pool, name_offsets, odd_ids=None):
+        self._count = len(ids)
+        self._ids = np.asarray(ids, dtype=np.int64)
+        self._values = np.ascontiguousarray(values, dtype=np.float64)
+        self._offsets = np.asarray(name_offsets, dtype=np.int64)
+        self._pool = bytearray(name_pool)
+        self.odd_ids = dict(odd_ids or {})
+
+    @classmethod
+    def from_columns(cls, ids, names, values):
+        """Build records from lists of ID and name strings and an N x fields float array."""
+        packed, odd_ids = pack_ids(ids)
+        pool, offsets = encode_names(names)
+        return cls(packed, values, pool, offsets, odd_ids)
+
+    @classmethod
+    def empty(cls, fields):
+        return cls(np.empty(0, dtype=np.int64), np.empty((0, fields)), b"", np.zeros(1, dtype=np.int64))
+
+    def extend(self, other):
+        """Append the rows of another Records."""
+        start, count = self._count, len(other)
+        if count == 0:
+            return
+        if start + count > len(self._ids):
+            capacity = max(start + count, int(len(self._ids) * GROWTH_FACTOR))
+            self._ids = _grow(self._ids, start, capacity)
+            self._values = _grow(self._values, start, capacity)
+            self._offsets = _grow(self._offsets, start + 1, capacity + 1)
+        self._ids[start:start + count] = other.ids
+        self._values[start:start + count] = other.values
+        self._offsets[start + 1:start + count + 1] = other.name_offsets[1:] + self._offsets[start]
+        self._pool += other._pool
+        for position, id_value in other.odd_ids.items():
+            self.odd_ids[start + position] = id_value
+        self._count += count
+
+    @property
+    def ids(self):
+        """Packed IDs, -1 where the ID is in odd_ids."""
+        return self._ids[:self._count]
+
+    @property
+    def values(self):
+        """The N x fields float64 block of emission values."""
+        return self._values[:self._count]
+
+    @property
+    def name_offsets(self):
+        return self._offsets[:self._count + 1]
+
+    @property
+    def name_pool(self):
+        return bytes(self._pool)
+
+    def id(self, row):
+        packed = int(self._ids[row])
+        return self.odd_ids[row] if packed < 0 else f"{packed:04d}"
+
+    def key(self, row):
+        """Lookup key of a row's ID, as pack_id returns it."""
+        packed = int(self._ids[row])
+        return self.odd_ids[row] if packed < 0 else packed
+
+    def name(self, row):
+        return self._pool[self._offsets[row]:self._offsets[row + 1]].decode("utf-8")
+
+    def ids_at(self, rows):
+        """Return the IDs of the given rows as strings."""
+        rows = np.asarray(rows, dtype=np.int64)
+        packed = self._ids[rows]
+        # str() is much faster than formatting; only IDs below 1000 need their zeros back
+        ids = list(map(str, packed.tolist()))
+        for position in np.flatnonzero(packed < 1000).tolist():
+            ids[position] = self.odd_ids[int(rows[position])] if packed[position] < 0 else f"{packed[position]:04d}"
+        return ids
+
+    def keys_at(self, rows):
+        """Return the lookup keys of the given rows' IDs."""
+        rows = np.asarray(rows, dtype=np.int64)
+        keys = self._ids[rows].tolist()
+        if self.odd_ids:
+            for position in np.flatnonzero(self._ids[rows] < 0).tolist():
+                keys[position] = self.odd_ids[int(rows[position])]
+        return keys
+
+    def names_at(self, rows):
+        """Return the names of the given rows as strings."""
+        rows = np.asarray(rows, dtype=np.int64)
+        pool = self._pool
+        return [pool[start:stop].decode("utf-8")
+                for start, stop in zip(self._offsets[rows].tolist(), self._offsets[rows + 1].tolist())]
+
+    def rows_with_id(self, id_value):
+        """Return every row holding an ID, in file order."""
+        key = pack_id(id_value)
+        if isinstance(key, str):
+            return np.array(sorted(row for row, odd in self.odd_ids.items() if odd == key), dtype=np.int64)
+        return np.flatnonzero(self.ids == key)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the rows (spare capacity included)."""
+        return self._ids.nbytes + self._values.nbytes + self._offsets.nbytes + len(self._pool)
+
+    def __len__(self):
+        return self._count
+
+
+class RowStrings:
+    """
+    The IDs or names of some rows of a Records, decoded only when read.
+
+    Indexing with an integer returns one string; a slice or an index array
+    returns another RowStrings, and tolist() decodes them all.
+    """
+
+    def __init__(self, decode, rows):
+        self._decode = decode
+        self.rows = rows
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self._decode([self.rows[key]])[0]
+        return RowStrings(self._decode, self.rows[key])
+
+    def tolist(self):
+        return self._decode(self.rows)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class IdLookup:
+    """
+    Position of an ID among some rows of a Records: a binary search in the
+    sorted packed IDs, so no dict of ID strings is built. Duplicate IDs
+    resolve to their first position.
+    """
+
+    def __init__(self, records, rows):
+        packed = records.ids[rows]
+        self._order = np.argsort(packed, kind="stable")
+        self._sorted = packed[self._order]
+        self._odd = {}
+        for position in np.flatnonzero(packed < 0).tolist():
+            self._odd.setdefault(records.odd_ids[int(rows[position])], position)
+
+    def find(self, id_value):
+        """Return the position of an ID, or None if none of the rows holds it."""
+        key = pack_id(id_value)
+        if isinstance(key, str):
+            return self._odd.get(key)
+        index = int(np.searchsorted(self._sorted, key))
+        if index < len(self._sorted) and self._sorted[index] == key:
+            return int(self._order[index])
+        return None
+
+
+def _grow(array, used, capacity):
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:used] = array[:used]
+    return grown
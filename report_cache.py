@@ -0,0 +1,193 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from emissions_store import tombstone_filename
+from instrumentation import increment
+
+# Report cache: every rendered report run is recorded in a manifest under the hash
+# of the data it was rendered from, so unchanged data reuses the existing PDFs and
+# the PDF tab lists reports from the manifest instead of stat-ing the directory.
+REPORTS_DIRECTORY = 'reports'
+MANIFEST_FILENAME = os.path.join(REPORTS_DIRECTORY, 'manifest.json')
+MANIFEST_VERSION = 1
+
+# Retention policy: keep the most recently used report runs, optionally only those
+# used within the last days. Either limit can be switched off with 0.
+KEEP_LAST = int(os.environ.get("GOGREEN_REPORTS_KEEP_LAST", "20"))
+MAX_AGE_DAYS = float(os.environ.get("GOGREEN_REPORTS_MAX_AGE_DAYS", "0"))
+
+_lock = threading.RLock()
+
+
+def _stat(filename):
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return [0, 0]
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _hash_file(digest, filename):
+    try:
+        with open(filename, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    except FileNotFoundError:
+        pass
+    digest.update(b'\0')
+
+
+def load_manifest():
+    """Return the manifest, building it from the files in the reports directory the first time."""
+    with _lock:
+        try:
+            with open(MANIFEST_FILENAME, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest
+        except (FileNotFoundError, ValueError):
+            pass
+        # One-time migration: every PDF already there becomes an uncached entry
+        manifest = {'version': MANIFEST_VERSION, 'source': None, 'reports': []}
+        if os.path.isdir(REPORTS_DIRECTORY):
+            for filename in os.listdir(REPORTS_DIRECTORY):
+                path = os.path.join(REPORTS_DIRECTORY, filename)
+                if filename.endswith('.pdf'):
+                    created = datetime.datetime.fromtimestamp(os.path.getctime(path)).isoformat(timespec='seconds')
+                    manifest['reports'].append({'key': None, 'created': created, 'used': created,
+                                                'files': [path], 'directories': []})
+        save_manifest(manifest)
+        return manifest
+
+
+def save_manifest(manifest):
+    """Atomically write the manifest."""
+    with _lock:
+        os.makedirs(REPORTS_DIRECTORY, exist_ok=True)
+        temp_filename = MANIFEST_FILENAME + '.tmp'
+        with open(temp_filename, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(temp_filename, MANIFEST_FILENAME)
+
+
+def report_key(csv_filename='emissions_data.csv', time_series=False, **options):
+    """
+    Return the cache key of a report run: a SHA-256 of the emissions CSV and its
+    tombstones plus the rendering options (e.g. top_n, statements).
+
+    The content hash is remembered in the manifest together with the size and
+    mtime of both files, so the data is only hashed again after it changed.
+    With time_series (runs whose statements show the monthly aggregates), the
+    size and mtime of the time-series aggregates database are part of the key.
+    """
+    if time_series:
+        from timeseries import get_timeseries
+
+        options['time_series'] = _stat(get_timeseries().aggregates_filename)
+    with _lock:
+        manifest = load_manifest()
+        stat = _stat(csv_filename) + _stat(tombstone_filename(csv_filename))
+        source = manifest.get('source')
+        if source and source['filename'] == csv_filename and source['stat'] == stat:
+            content_hash = source['hash']
+        else:
+            digest = hashlib.sha256()
+            _hash_file(digest, csv_filename)
+            _hash_file(digest, tombstone_filename(csv_filename))
+            content_hash = digest.hexdigest()
+            manifest['source'] = {'filename': csv_filename, 'stat': stat, 'hash': content_hash}
+            save_manifest(manifest)
+    return hashlib.sha256(json.dumps([content_hash, options], sort_keys=True).encode()).hexdigest()
+
+
+def cached_report(key):
+    """Return the files of the report run with this key (including those in its directories), or None if it is not cached."""
+    with _lock:
+        manifest = load_manifest()
+        for entry in manifest['reports']:
+            if entry['key'] == key:
+                if not all(os.path.exists(path) for path in entry['files'] + entry['directories']):
+                    # Removed by hand: forget it and render again
+                    manifest['reports'].remove(entry)
+                    save_manifest(manifest)
+                    break
+                entry['used'] = datetime.datetime.now().isoformat(timespec='seconds')
+                save_manifest(manifest)
+                increment('report_cache.hits')
+                files = list(entry['files'])
+                for directory in entry['directories']:
+                    files += sorted(os.path.join(directory, filename) for filename in os.listdir(directory))
+                return files
+    increment('report_cache.misses')
+    return None
+
+
+def record_report(key, files, directories=(), keep_last=None, max_age_days=None):
+    """Add a rendered report run to the manifest and apply the retention policy."""
+    now = datetime.datetime.now().isoformat(timespec='seconds')
+    with _lock:
+        manifest = load_manifest()
+        manifest['reports'] = [entry for entry in manifest['reports'] if entry['key'] != key or key is None]
+        manifest['reports'].append({'key': key, 'created': now, 'used': now,
+                                    'files': list(files), 'directories': list(directories)})
+        apply_retention(manifest, keep_last, max_age_days)
+        save_manifest(manifest)
+
+
+def apply_retention(manifest, keep_last=None, max_age_days=None, include_migrated=False):
+    """
+    Delete the report runs outside the retention policy and drop them from the manifest.
+
+    Reports that were already in the reports directory when the manifest was
+    first built (entries without a key) may be tracked by version control, so
+    they are left alone unless include_migrated is given.
+
+    Args:
+        manifest (dict): Manifest from load_manifest(), updated in place.
+        keep_last (int, optional): Keep this many most recently used runs (default KEEP_LAST).
+        max_age_days (float, optional): Also delete runs not used for this many days
+            (default MAX_AGE_DAYS).
+        include_migrated (bool): Apply the policy to the migrated reports too.
+
+    Returns:
+        int: Number of report runs deleted.
+    """
+    keep_last = KEEP_LAST if keep_last is None else keep_last
+    max_age_days = MAX_AGE_DAYS if max_age_days is None else max_age_days
+    migrated = [] if include_migrated else [entry for entry in manifest['reports'] if entry['key'] is None]
+    entries = sorted((entry for entry in manifest['reports'] if entry not in migrated),
+                     key=lambda entry: entry['used'], reverse=True)
+    keep = entries[:keep_last] if keep_last else entries
+    if max_age_days:
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=max_age_days)).isoformat(timespec='seconds')
+        keep = [entry for entry in keep if entry['used'] >= cutoff]
+    expired = [entry for entry in entries if entry not in keep]
+    for entry in expired:
+        for path in entry['files']:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        for directory in entry['directories']:
+            shutil.rmtree(directory, ignore_errors=True)
+    manifest['reports'] = migrated + keep
+    return len(expired)
+
+
+def prune_reports(keep_last=None, max_age_days=None, include_migrated=False):
+    """Apply the retention policy now and return the number of report runs deleted."""
+    with _lock:
+        manifest = load_manifest()
+        deleted = apply_retention(manifest, keep_last, max_age_days, include_migrated)
+        save_manifest(manifest)
+        return deleted
+
+
+def list_reports():
+    """Return the report file names (relative to the reports directory), newest first."""
+    entries = sorted(load_manifest()['reports'], key=lambda entry: entry['created'], reverse=True)
+    return [os.path.relpath(path, REPORTS_DIRECTORY) for entry in entries for path in entry['files']]
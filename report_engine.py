@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from emissions_dataset import get_dataset, EMISSION_FIELDS
+from instrumentation import timed
+
+# Statements rendered per worker task: large enough to amortize pickling and
+# scheduling, small enough that progress moves steadily and all cores stay busy
+STATEMENT_BATCH_SIZE = 200
+
+def statement_directory(graph_pdf_filename):
+    """Directory for the statements of a report run, named after its timestamp."""
+    stamp = os.path.basename(graph_pdf_filename)[len('emission_report_graph_'):-len('.pdf')]
+    return os.path.join('reports', f'statements_{stamp}')
+
+def statement_rows(csv_filename='emissions_data.csv', ids=None):
+    """
+    Return the emissions rows the statements are rendered from.
+
+    Args:
+        csv_filename (str): Emissions CSV file.
+        ids (iterable, optional): Only these company IDs; every company if omitted.
+
+    Returns:
+        list: Dicts with ID, Name and every emission field (floats).
+    """
+    dataset = get_dataset(csv_filename)
+    with dataset.lock:
+        if ids is None:
+            indices = np.arange(len(dataset))
+        else:
+            lookup = dataset.id_lookup()
+            indices = np.array(sorted({lookup.find(company_id) for company_id in ids} - {None}), dtype=np.intp)
+        company_ids = dataset.ids[indices].tolist()
+        names = dataset.names[indices].tolist()
+        values = dataset.values[indices].tolist()
+    return [{"ID": company_id, "Name": name, **dict(zip(EMISSION_FIELDS, row))}
+            for company_id, name, row in zip(company_ids, names, values)]
+
+@timed()
+def render_reports(top_n=10, statements=False, statement_ids=None, workers=None, progress=None,
+                   pages_per_volume=None):
+    """
+    Render the report artifacts in parallel in a pool of worker processes.
+
+    The graph PDF, the data PDF and batches of per-company statement PDFs are
+    independent, so each is a separate task and all CPU cores render at once.
+    Workers read the emissions CSV themselves; statement rows are sent to them
+    in batches of STATEMENT_BATCH_SIZE.
+
+    Args:
+        top_n (int): Companies in the graph.
+        statements (bool): Also write one statement PDF per company.
+        statement_ids (iterable, optional): Limit the statements to these company IDs.
+        workers (int, optional): Worker processes; defaults to the number of CPUs.
+        progress (callable, optional): Called as progress(done, total) in the calling
+            process each time a task finishes.
+        pages_per_volume (int, optional): Split the data report into files of this many pages.
+
+    Returns:
+        list: Names of the PDF files written, graph and data report (volumes) first.
+    """
+    from pdf_report import report_filenames, render_graph_pdf, render_data_pdf, render_company_statements
+    from report_cache import report_key, cached_report, record_report
+
+    # Unchanged data reuses the PDFs already rendered from it
+    with_statements = bool(statements) or statement_ids is not None
+    # Statements show the monthly aggregates too, so new readings must not hit the cache
+    key = report_key(time_series=with_statements, top_n=top_n, statements=bool(statements),
+                     pages_per_volume=pages_per_volume,
+                     statement_ids=sorted(statement_ids) if statement_ids is not None else None)
+    cached = cached_report(key)
+    if cached:
+        return cached
+
+    graph_pdf_filename, report_pdf_filename = report_filenames()
+    os.makedirs('reports', exist_ok=True)
+
+    batches = []
+    if with_statements:
+        rows = statement_rows(ids=statement_ids)
+        batches = [rows[start:start + STATEMENT_BATCH_SIZE] for start in range(0, len(rows), STATEMENT_BATCH_SIZE)]
+        directory = statement_directory(graph_pdf_filename)
+
+    # Spawned (not forked) workers: the parent may hold threads and locks, e.g. in the GUI
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context) as pool:
+        # The data table is the longest single task, so it is queued first
+        futures = [pool.submit(render_data_pdf, report_pdf_filename, pages_per_volume),
+                   pool.submit(render_graph_pdf, graph_pdf_filename, top_n)]
+        futures += [pool.submit(render_company_statements, batch, directory) for batch in batches]
+
+        total = len(futures)
+        if progress is not None:
+            progress(0, total)
+        for done, future in enumerate(as_completed(futures), start=1):
+            # Re-raise the first worker error in the caller
+            future.result()
+            if progress is not None:
+                progress(done, total)
+
+    filenames = [graph_pdf_filename] + futures[0].result()
+    report_files = list(filenames)
+    for future in futures[2:]:
+        filenames += future.result()
+    record_report(key, report_files, [directory] if batches else [])
+    return filenames
@@ -0,0 +1,101 @@
+import queue
+import threading
+
+
+class ReportWorker:
+    """
+    Generates PDF reports on a background thread so the Tk main loop never
+    waits for matplotlib or ReportLab.
+
+    There is at most one pending job: requests made while a report is
+    already waiting are merged into it, so a burst of adds collapses into a
+    single render of the latest data whose callbacks are all called when it
+    finishes. Finished jobs are put on a result queue that the GUI drains
+    with ``poll()`` from an ``after()`` callback.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._pending = None
+        self._busy = False
+        self._stopping = False
+        self._thread = None
+        self.results = queue.Queue()
+
+    def submit(self, pdf_filename='reports/emissions_report.pdf', callback=None):
+        """Queue a report, merging it into any job that has not started yet."""
+        with self._condition:
+            # The merged job renders the latest request and reports to every caller
+            callbacks = self._pending[1] if self._pending is not None else []
+            if callback is not None:
+                callbacks.append(callback)
+            self._pending = (pdf_filename, callbacks)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="report-worker", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    @property
+    def busy(self):
+        """True while a report is rendering or waiting to be rendered."""
+        with self._condition:
+            return self._busy or self._pending is not None
+
+    def _run(self):
+        from pdf_report import generate_and_save_graph_to_pdf
+
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopping:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                pdf_filename, callbacks = self._pending
+                self._pending = None
+                self._busy = True
+            try:
+                generate_and_save_graph_to_pdf(pdf_filename)
+                error = None
+            except Exception as e:
+                error = e
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+            self.results.put((callbacks, error))
+
+    def poll(self):
+        """
+        Run the callbacks of finished jobs in the calling thread and return
+        how many jobs finished. Never blocks; meant to be called from ``after()``.
+        """
+        finished = 0
+        while True:
+            try:
+                callbacks, error = self.results.get_nowait()
+            except queue.Empty:
+                return finished
+            finished += 1
+            for callback in callbacks:
+                callback(error)
+
+    def shutdown(self, wait=True):
+        """Finish any pending report, then stop the worker thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if wait and thread is not None:
+            thread.join()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_report_worker():
+    """Return the process-wide report worker."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = ReportWorker()
+        return _worker
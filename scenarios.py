@@ -0,0 +1,185 @@
+from itertools import product
+
+import numpy as np
+
+from emission_factors import FACTOR_FIELDS, factor_vector
+
+# What-if scenarios: interventions on the activity behind the stored emissions
+# (move part of the car use to the train, replace coal with electricity, cut
+# fuel oil...). Every intervention is a linear map of a company's activity, so a
+# whole scenario reduces to one weight per emission field, and the savings of a
+# batch of scenarios over all companies are a single matrix product.
+
+# Cells of the companies x scenarios savings matrix computed at a time when ranking
+# companies; blocks that stay in the CPU cache are several times faster than larger ones
+BLOCK_CELLS = 1 << 18
+
+# Standard interventions shown by Retrieve Data. With the current factors a train trip
+# emits more per unit than a car trip, so the first one shows an increase ("adds")
+DEFAULT_SCENARIOS = [
+    {"name": "Move 30% of car use to the train", "strategies": [{"shift": "Car", "to": "Train", "share": 0.3}]},
+    {"name": "Replace coal with electricity", "strategies": [{"shift": "Coal", "to": "Electricity", "share": 1.0}]},
+    {"name": "Cut fuel oil by 20%", "strategies": [{"reduce": "Fuel Oil", "share": 0.2}]},
+]
+
+
+def _field(name):
+    if name not in FACTOR_FIELDS:
+        raise ValueError(f"Unknown field: {name} (use {', '.join(FACTOR_FIELDS)})")
+    return FACTOR_FIELDS.index(name)
+
+
+def _share(value):
+    share = float(value)
+    if not 0 <= share <= 1:
+        raise ValueError(f"A share must be between 0 and 1, got {value}")
+    return share
+
+
+def activity_matrix(strategies):
+    """
+    Return the matrix mapping a company's activity (a vector in FACTOR_FIELDS
+    order) to its activity once the strategies are applied, in order.
+
+    Strategies are dicts:
+        {"shift": "Car", "to": "Train", "share": 0.3, "ratio": 1.0}
+            moves 30% of the car activity to the train, each unit becoming
+            ``ratio`` units of train activity (default 1);
+        {"reduce": "Fuel Oil", "share": 0.2}
+            cuts the fuel oil activity by 20%.
+    """
+    size = len(FACTOR_FIELDS)
+    matrix = np.eye(size)
+    for strategy in strategies:
+        step = np.eye(size)
+        if "shift" in strategy:
+            source, target = _field(strategy["shift"]), _field(strategy["to"])
+            if source == target:
+                raise ValueError(f"Cannot shift {strategy['shift']} to itself")
+            share = _share(strategy["share"])
+            step[source, source] = 1 - share
+            step[target, source] = share * float(strategy.get("ratio", 1.0))
+        elif "reduce" in strategy:
+            field = _field(strategy["reduce"])
+            step[field, field] = 1 - _share(strategy["share"])
+        else:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        matrix = step @ matrix
+    return matrix
+
+
+def savings_weights(scenarios, version=None):
+    """
+    Return an S x fields array: the kg CO2 each scenario saves per kg CO2
+    stored in each emission field.
+
+    Emissions are activity times the annualized factor f, so a scenario with
+    activity matrix M turns a company's emissions e into f * (M @ (e / f)),
+    and its total falls by e @ (1 - (M.T @ f) / f).
+    """
+    factors = factor_vector(version)
+    size = len(FACTOR_FIELDS)
+    matrices = np.array([activity_matrix(scenario["strategies"]) for scenario in scenarios]).reshape(-1, size, size)
+    projected = np.einsum("sij,i->sj", matrices, factors)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = 1 - projected / factors
+    # A field without a factor holds no emissions, so there is nothing to scale back to activity
+    weights[:, factors == 0] = 0
+    return weights
+
+
+def row_savings(row, scenarios, version=None):
+    """
+    Return the kg CO2 one company saves under each scenario, computed from its
+    stored emissions row alone (a dict by field, values as stored), as a list.
+    """
+    values = np.nan_to_num([float(row.get(field) or 0) for field in FACTOR_FIELDS])
+    return (savings_weights(scenarios, version) @ values).tolist()
+
+
+def format_savings(savings, percent):
+    """Return "saves 1.38 kg CO2 (2.1%)", or "adds ..." for a scenario that increases the emissions."""
+    verb = "saves" if savings >= 0 else "adds"
+    return f"{verb} {abs(savings):.2f} kg CO2 ({abs(percent):.1f}%)"
+
+
+def grid(strategies, steps):
+    """
+    Return the scenarios combining every strategy at steps + 1 shares, from
+    0 up to its own share: 3 strategies and 10 steps give 1331 scenarios.
+    """
+    levels = [np.linspace(0, _share(strategy["share"]), steps + 1).tolist() for strategy in strategies]
+    scenarios = []
+    for shares in product(*levels):
+        scaled = [{**strategy, "share": share} for strategy, share in zip(strategies, shares)]
+        scenarios.append({"name": ", ".join(describe(strategy) for strategy in scaled), "strategies": scaled})
+    return scenarios
+
+
+def describe(strategy):
+    """Return a short description of a strategy, e.g. "Car->Train 30%"."""
+    percent = f"{float(strategy['share']) * 100:g}%"
+    if "shift" in strategy:
+        return f"{strategy['shift']}->{strategy['to']} {percent}"
+    return f"{strategy['reduce']} -{percent}"
+
+
+class ScenarioResults:
+    """
+    Projected savings of a batch of scenarios over an N x fields block of
+    emission values (one row per company, FACTOR_FIELDS order).
+
+    ``portfolio`` holds the kg CO2 saved by each scenario over all companies
+    and ``baseline`` their current total. Savings per company are computed on
+    request: company_savings() for some rows, top_companies() for the
+    companies saving most under each scenario.
+    """
+
+    def __init__(self, values, scenarios, version=None):
+        self.scenarios = list(scenarios)
+        self.weights = savings_weights(self.scenarios, version)
+        self._values = values
+        column_totals = np.nan_to_num(values).sum(axis=0)
+        self.baseline = float(column_totals.sum())
+        self.portfolio = self.weights @ column_totals
+
+    def company_savings(self, rows=None):
+        """Return a rows x S array of the kg CO2 each company saves under each scenario (default: all rows)."""
+        values = self._values if rows is None else self._values[rows]
+        return np.nan_to_num(values) @ self.weights.T
+
+    def top_companies(self, n=10):
+        """
+        Return (rows, savings), two S x n arrays: under each scenario, the
+        rows of the n companies saving most and their savings, largest first.
+        The savings matrix is computed in blocks of rows, so it is never held
+        whole; past the first block, only the cells beating a scenario's n-th
+        best so far are looked at again.
+        """
+        count = len(self._values)
+        n = min(n, count)
+        scenario_count = len(self.scenarios)
+        if n == 0:
+            return np.empty((scenario_count, 0), dtype=np.int64), np.empty((scenario_count, 0))
+        block_rows = max(n, BLOCK_CELLS // max(scenario_count, 1))
+        best_rows = best_savings = None
+        for start in range(0, count, block_rows):
+            block = self.weights @ np.nan_to_num(self._values[start:start + block_rows]).T
+            if best_savings is None:
+                keep = np.argsort(-block, axis=1, kind="stable")[:, :n]
+                best_savings = np.take_along_axis(block, keep, axis=1)
+                best_rows = keep + start
+                continue
+            # flatnonzero is much faster than a 2-D nonzero on a mostly False mask
+            scenario, column = np.divmod(np.flatnonzero(block > best_savings[:, -1:]), block.shape[1])
+            if len(scenario) == 0:
+                continue
+            # Merge the candidates with the n best so far, by scenario then savings
+            scenarios = np.concatenate([np.repeat(np.arange(scenario_count), n), scenario])
+            savings = np.concatenate([best_savings.ravel(), block[scenario, column]])
+            rows = np.concatenate([best_rows.ravel(), column + start])
+            order = np.lexsort((-savings, scenarios))
+            firsts = np.searchsorted(scenarios[order], np.arange(scenario_count))
+            keep = order[firsts[:, None] + np.arange(n)]
+            best_savings, best_rows = savings[keep], rows[keep]
+        return best_rows, best_savings
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import json
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+import core
+from core import EmissionsError, CompanyNotFound
+from emissions_dataset import get_dataset, EMISSION_FIELDS
+from instrumentation import timer
+from timeseries import get_timeseries
+
+# Local HTTP/JSON API for the emissions data, e.g.:
+#   python server.py --port 8080
+#   curl localhost:8080/companies/1234
+#   curl -X POST localhost:8080/companies -d '{"ID": "4321", "Name": "Acme Ltd", "Car": "120", ...}'
+#
+# Endpoints:
+#   GET    /companies?offset=0&limit=100   companies ordered by name
+#   GET    /companies/<id>                 one company with its summary
+#   POST   /companies                      add a company from monthly activity values (JSON body)
+#   DELETE /companies/<id>                 delete a company
+#   GET    /top?n=10                       companies with the highest total emissions
+
+# Seconds between checks for changes made by other processes (GUI, CLI, imports)
+WATCH_INTERVAL = 1.0
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 1 << 20
+# Companies of the ranking copied into every snapshot for /top
+TOP_LIMIT = 100
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class Snapshot:
+    """
+    Immutable view of one version of the shared dataset that read requests
+    are answered from without touching the files or taking locks.
+    """
+
+    def __init__(self, dataset):
+        with dataset.lock:
+            self.version = dataset.version
+            self.ids = dataset.ids
+            self.names = dataset.names
+            self.values = dataset.values
+            self.energy_totals = dataset.energy_totals
+            self.transportation_totals = dataset.transportation_totals
+            self.totals = dataset.totals
+            self.name_order = dataset.name_order()
+            self.ranked = dataset.top_n(TOP_LIMIT)
+            # ID -> row; legacy duplicate IDs resolve to their first row, like the store's lookups
+            self.positions = dataset.id_lookup()
+        self._top = {}
+
+    def get(self, company_id):
+        position = self.positions.find(company_id)
+        if position is None:
+            raise CompanyNotFound("Company ID not found.")
+        row = {"ID": company_id, "Name": self.names[position],
+               **dict(zip(EMISSION_FIELDS, self.values[position].tolist()))}
+        return {"row": row, **core.summarize_emissions(row)}
+
+    def list(self, offset=0, limit=None):
+        stop = len(self.name_order) if limit is None else offset + limit
+        page = self.name_order[offset:stop]
+        return [{"ID": company_id, "Name": name} for company_id, name in zip(self.ids[page].tolist(), self.names[page].tolist())]
+
+    def top(self, n=10):
+        result = self._top.get(n)
+        if result is None:
+            n = max(0, min(n, len(self.totals)))
+            if n <= len(self.ranked):
+                indices = self.ranked[:n]
+            else:
+                # Beyond the copied ranking: partial selection over this snapshot's totals
+                candidates = np.argpartition(-self.totals, n - 1)[:n] if n < len(self.totals) else np.arange(n)
+                indices = candidates[np.argsort(-self.totals[candidates], kind="stable")]
+            result = self._top[n] = [{"ID": company_id, "Name": name,
+                                      "energy_emissions": float(self.energy_totals[i]),
+                                      "transportation_emissions": float(self.transportation_totals[i]),
+                                      "total_emissions": float(self.totals[i])}
+                                     for i, company_id, name in zip(indices, self.ids[indices].tolist(),
+                                                                    self.names[indices].tolist())]
+        return result
+
+
+class EmissionsServer:
+    """
+    asyncio HTTP/JSON server for the core API.
+
+    Reads are answered on the event loop from the current Snapshot, so any
+    number of clients are served concurrently. Writes are queued to a single
+    writer task that applies them one after another in a worker thread and,
+    once the queue is drained, publishes a new snapshot for the whole batch
+    before answering the writers.
+    """
+
+    def __init__(self, csv_filename=core.CSV_FILENAME):
+        self.csv_filename = csv_filename
+        self.snapshot = None
+        self.writes = None
+        self._refreshing = None
+        self._tasks = []
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Load the first snapshot and start listening. Returns the asyncio server."""
+        self.writes = asyncio.Queue()
+        self._refreshing = asyncio.Lock()
+        await self.refresh_snapshot()
+        self._tasks = [asyncio.create_task(self._writer()), asyncio.create_task(self._watch())]
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def refresh_snapshot(self):
+        """Publish a new snapshot if the dataset changed."""
+        loop = asyncio.get_running_loop()
+        # The writer and the watcher both refresh; one at a time, so a snapshot built
+        # from an older load can never replace a newer one
+        async with self._refreshing:
+            dataset = await loop.run_in_executor(None, get_dataset, self.csv_filename)
+            if self.snapshot is None or dataset.version > self.snapshot.version:
+                snapshot = await loop.run_in_executor(None, Snapshot, dataset)
+                if self.snapshot is None or snapshot.version > self.snapshot.version:
+                    self.snapshot = snapshot
+
+    async def write(self, func, *args):
+        """Queue a write for the writer task and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.writes.put((func, args, future))
+        return await future
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.writes.get()]
+            while not self.writes.empty():
+                batch.append(self.writes.get_nowait())
+            outcomes = []
+            for func, args, future in batch:
+                try:
+                    outcomes.append((future, await loop.run_in_executor(None, func, *args), None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            # One snapshot per batch of writes, published before the writers are
+            # answered, so a client reads its own write back
+            try:
+                await self.refresh_snapshot()
+            finally:
+                for future, result, error in outcomes:
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+
+    async def _watch(self):
+        # Pick up changes written by other processes
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL)
+            await self.refresh_snapshot()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0) or 0)
+                if length > MAX_BODY_SIZE:
+                    status, payload = 413, {"error": "Request body too large."}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    with timer("server." + (method if method in ("GET", "POST", "DELETE") else "other")):
+                        status, payload = await self.dispatch(method, target, body)
+                    keep_alive = (headers.get("connection", "").lower() != "close" and version == "HTTP/1.1")
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(f"{version if version.startswith('HTTP/') else 'HTTP/1.1'} {status} {REASONS[status]}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        """Route one request. Returns (HTTP status, JSON-serializable payload)."""
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if parts == ["companies"] and method == "GET":
+                offset = int(query.get("offset", 0))
+                limit = int(query["limit"]) if "limit" in query else None
+                return 200, self.snapshot.list(offset, limit)
+            if parts == ["companies"] and method == "POST":
+                data = json.loads(body or b"{}")
+                if not isinstance(data, dict):
+                    raise EmissionsError("The request body must be a JSON object.")
+                # Form values arrive as text in the GUI; accept JSON numbers too
+                data = {key: value if isinstance(value, str) else json.dumps(value) for key, value in data.items()}
+                row = await self.write(core.add_company, data)
+                return 201, {key: row[key] for key in ["ID", "Name"] + EMISSION_FIELDS}
+            if len(parts) == 2 and parts[0] == "companies" and method == "GET":
+                company_id = core.parse_company_id(parts[1])
+                company = self.snapshot.get(company_id)
+                # The aggregates live in SQLite: look them up off the event loop
+                time_series = await asyncio.get_running_loop().run_in_executor(
+                    None, lambda: get_timeseries().aggregates(company_id))
+                return 200, {**company, "time_series": time_series}
+            if len(parts) == 2 and parts[0] == "companies" and method == "DELETE":
+                company_id = core.parse_company_id(parts[1])
+                await self.write(core.delete_company, company_id)
+                return 200, {"deleted": company_id}
+            if parts == ["top"] and method == "GET":
+                return 200, self.snapshot.top(int(query.get("n", 10)))
+            if parts and parts[0] in ("companies", "top"):
+                return 405, {"error": f"{method} is not supported on {url.path}."}
+            return 404, {"error": f"No such resource: {url.path}"}
+        except CompanyNotFound as e:
+            return 404, {"error": str(e)}
+        except EmissionsError as e:
+            return 400, {"error": str(e)}
+        except ValueError as e:
+            # Malformed JSON or query parameters
+            return 400, {"error": f"Invalid request: {e}"}
+        except Exception as e:
+            return 500, {"error": f"Error occurred: {e}"}
+
+
+async def serve(host, port):
+    server = EmissionsServer()
+    listener = await server.start(host, port)
+    print(f"Serving emissions data on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the emissions data as a local HTTP/JSON API.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default: localhost only)")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+
+from core import TRANSPORTATION_FIELDS, ENERGY_FIELDS
+from instrumentation import timed
+
+# Time-series mode: dated monthly readings per company. The readings are appended
+# to one CSV partition per month (timeseries/<YYYY-MM>.csv); the rolling
+# aggregates of every company are kept up to date in an SQLite file beside them.
+TIMESERIES_DIRECTORY = "timeseries"
+EMISSION_FIELDS = TRANSPORTATION_FIELDS + ENERGY_FIELDS
+# Partition rows hold the raw monthly activity of each field, like <csv>.activity
+PARTITION_FIELDNAMES = ["ID", "Month", "Factor Version"] + EMISSION_FIELDS
+
+# Months of monthly emissions kept per company for the aggregates: rolling
+# 12 months plus the previous year's year-to-date never reach further back
+WINDOW_MONTHS = 24
+
+
+def month_index(month):
+    """Return a 'YYYY-MM' month as a running month number."""
+    year, month_of_year = month.split("-")
+    return int(year) * 12 + int(month_of_year) - 1
+
+
+def compute_aggregates(window):
+    """
+    Return the aggregates of a company from its window of monthly emissions.
+
+    Args:
+        window (dict): {'YYYY-MM': [monthly emissions in EMISSION_FIELDS order]}.
+
+    Returns:
+        dict: ``latest_month``; ``rolling_12`` (with its ``transportation_12`` and
+            ``energy_12`` parts) over the 12 months up to the latest one; ``ytd`` from
+            January of the latest month's year; ``previous_ytd`` over the same months
+            one year earlier; ``yoy_change`` and ``yoy_percent`` between the two.
+    """
+    latest_month = max(window, key=month_index)
+    latest = month_index(latest_month)
+    year, month_of_year = divmod(latest, 12)
+    transportation_12 = energy_12 = ytd = previous_ytd = 0.0
+    transportation = [EMISSION_FIELDS.index(field) for field in TRANSPORTATION_FIELDS]
+    energy = [EMISSION_FIELDS.index(field) for field in ENERGY_FIELDS]
+    for month, values in window.items():
+        index = month_index(month)
+        total = sum(values)
+        if latest - 12 < index <= latest:
+            transportation_12 += sum(values[i] for i in transportation)
+            energy_12 += sum(values[i] for i in energy)
+        if year * 12 <= index <= latest:
+            ytd += total
+        elif (year - 1) * 12 <= index <= (year - 1) * 12 + month_of_year:
+            previous_ytd += total
+    return {
+        "latest_month": latest_month,
+        "rolling_12": transportation_12 + energy_12,
+        "transportation_12": transportation_12,
+        "energy_12": energy_12,
+        "ytd": ytd,
+        "previous_ytd": previous_ytd,
+        "yoy_change": ytd - previous_ytd,
+        "yoy_percent": (ytd - previous_ytd) / previous_ytd * 100 if previous_ytd else None,
+    }
+
+
+def format_aggregates(aggregates):
+    """Return the aggregates of a company as lines of display text."""
+    lines = [f"Monthly Readings up to {aggregates['latest_month']}",
+             f"Rolling 12 Months: {aggregates['rolling_12']:.2f} kg CO2 "
+             f"(Transportation {aggregates['transportation_12']:.2f}, Energy {aggregates['energy_12']:.2f})",
+             f"Year to Date: {aggregates['ytd']:.2f} kg CO2"]
+    if aggregates["yoy_percent"] is not None:
+        lines.append(f"Year over Year: {aggregates['yoy_change']:+.2f} kg CO2 ({aggregates['yoy_percent']:+.1f}%)")
+    return lines
+
+
+class TimeSeriesStore:
+    """
+    Monthly emissions readings, partitioned by month, with incremental aggregates.
+
+    Every reading is appended to the partition file of its month together with
+    its raw activity and factor version. Per company, only the monthly emissions
+    of the last WINDOW_MONTHS months are kept beside the aggregates, so adding a
+    month updates rolling 12-month, year-to-date and year-over-year totals from
+    at most 24 small vectors instead of rescanning the partitions.
+    """
+
+    def __init__(self, directory=TIMESERIES_DIRECTORY):
+        self.directory = directory
+        self.aggregates_filename = os.path.join(directory, "aggregates.sqlite")
+        self.lock = threading.RLock()
+        self.conn = None
+
+    def _connect(self, create=False):
+        # The directory is only created by the first reading, so lookups in a
+        # data directory without time series have no side effects
+        if self.conn is None:
+            if not create and not os.path.exists(self.aggregates_filename):
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            self.conn = sqlite3.connect(self.aggregates_filename, check_same_thread=False)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS records (id TEXT NOT NULL, month TEXT NOT NULL, "
+                              "PRIMARY KEY (id, month))")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS aggregates (id TEXT PRIMARY KEY, months TEXT NOT NULL, "
+                              "aggregates TEXT NOT NULL)")
+            self.conn.commit()
+        return self.conn
+
+    def partition_filename(self, month):
+        """Return the partition file of a 'YYYY-MM' month."""
+        return os.path.join(self.directory, f"{month}.csv")
+
+    def has_record(self, id_value, month):
+        """Return True if a reading for this company and month is recorded."""
+        with self.lock:
+            conn = self._connect()
+            return conn is not None and conn.execute("SELECT 1 FROM records WHERE id = ? AND month = ?",
+                                                     (id_value, month)).fetchone() is not None
+
+    @timed()
+    def add(self, id_value, month, activity, factor_version, emissions):
+        """
+        Append one monthly reading and update the company's aggregates.
+
+        Args:
+            id_value (str): Company ID.
+            month (str): 'YYYY-MM'.
+            activity (dict): Raw activity of the month by field.
+            factor_version (int): Emission factor version the emissions were calculated with.
+            emissions (dict): Emissions of the month (kg CO2) by field.
+
+        Returns:
+            dict: The company's new aggregates (see compute_aggregates).
+        """
+        with self.lock:
+            if self.has_record(id_value, month):
+                raise ValueError(f"A reading for {month} is already recorded for company {id_value}.")
+            conn = self._connect(create=True)
+            filename = self.partition_filename(month)
+            with open(filename, "a", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                if file.tell() == 0:
+                    writer.writerow(PARTITION_FIELDNAMES)
+                writer.writerow([id_value, month, factor_version] + [activity[field] for field in EMISSION_FIELDS])
+
+            row = conn.execute("SELECT months FROM aggregates WHERE id = ?", (id_value,)).fetchone()
+            window = json.loads(row[0]) if row else {}
+            window[month] = [float(emissions[field]) for field in EMISSION_FIELDS]
+            # Months that can no longer reach any aggregate leave the window
+            latest = max(month_index(m) for m in window)
+            window = {m: values for m, values in window.items() if month_index(m) > latest - WINDOW_MONTHS}
+            aggregates = compute_aggregates(window)
+            conn.execute("INSERT OR REPLACE INTO aggregates (id, months, aggregates) VALUES (?, ?, ?)",
+                         (id_value, json.dumps(window), json.dumps(aggregates)))
+            conn.execute("INSERT INTO records (id, month) VALUES (?, ?)", (id_value, month))
+            conn.commit()
+            return aggregates
+
+    def aggregates(self, id_value):
+        """Return the precomputed aggregates of a company, or None if it has no readings."""
+        with self.lock:
+            conn = self._connect()
+            row = conn and conn.execute("SELECT aggregates FROM aggregates WHERE id = ?", (id_value,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def aggregates_many(self, ids):
+        """Return {ID: aggregates} for the companies among ids that have readings."""
+        ids = list(ids)
+        result = {}
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return result
+            # Chunked to stay below SQLite's limit on query parameters
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                query = f"SELECT id, aggregates FROM aggregates WHERE id IN ({','.join('?' * len(chunk))})"
+                result.update((id_value, json.loads(data)) for id_value, data in conn.execute(query, chunk))
+        return result
+
+    def delete(self, id_value):
+        """
+        Forget a deleted company's aggregates and recorded months. Its rows stay
+        in the partition files as history but no longer count anywhere.
+        """
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            conn.execute("DELETE FROM aggregates WHERE id = ?", (id_value,))
+            conn.execute("DELETE FROM records WHERE id = ?", (id_value,))
+            conn.commit()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_timeseries(directory=TIMESERIES_DIRECTORY):
+    """Return the process-wide time-series store for a directory."""
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = TimeSeriesStore(directory)
+        return store
@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a lock file, held across processes.
+
+    Uses flock on POSIX and msvcrt.locking on Windows. The lock is reentrant
+    for the thread holding it and also serializes the threads of one
+    process, so it can guard every write to the emissions files.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                file = open(self.filename, "a+b")
+                if fcntl is not None:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+                else:
+                    file.seek(0)
+                    while True:
+                        try:
+                            # LK_LOCK retries for about 10 seconds before giving up
+                            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            pass
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            self._file = file
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            file, self._file = self._file, None
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+            file.close()
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class WriteAheadLog:
+    """
+    Append-only log of write batches, one JSON line each.
+
+    A batch is appended and fsynced before it is applied to the data files;
+    once applied, a short ``{"applied": ...}`` marker line follows it. So a
+    log that does not end with a marker holds a batch whose writer crashed
+    before finishing it, which the store redoes. The log is only touched
+    while the store's FileLock is held.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def append(self, ops):
+        """Durably log a batch of operations: one write and a single fsync."""
+        with open(self.filename, "ab") as file:
+            file.write(json.dumps({"ops": ops}).encode("utf-8") + b"\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def mark_applied(self, sizes):
+        """Record that the last batch was applied and the data file sizes it left behind (not fsynced)."""
+        with open(self.filename, "ab") as file:
+            file.write(json.dumps({"applied": sizes}).encode("utf-8") + b"\n")
+
+    def size(self):
+        try:
+            return os.path.getsize(self.filename)
+        except FileNotFoundError:
+            return 0
+
+    def _last_marker(self):
+        # The applied marker the log ends with, read from its last bytes; None if
+        # the log ends with anything else. Markers are short, batches are not.
+        size = self.size()
+        if size == 0:
+            return None
+        with open(self.filename, "rb") as file:
+            file.seek(max(0, size - 4096))
+            tail = file.read()
+        last = tail[:-1].rsplit(b"\n", 1)[-1]
+        if not tail.endswith(b"\n") or not last.startswith(b'{"applied"'):
+            return None
+        return json.loads(last)["applied"]
+
+    def is_clean(self):
+        """True if the log is empty or ends with an applied marker."""
+        return self.size() == 0 or self._last_marker() is not None
+
+    def last_sizes(self):
+        """Return the file sizes recorded by the applied marker the log ends with, or None."""
+        return self._last_marker()
+
+    def records(self):
+        """
+        Return the logged batches as (ops, sizes) pairs, sizes being the marker's
+        file sizes or None for a batch that was never marked applied. A torn
+        last line, from a writer that crashed before its fsync returned, is dropped.
+        """
+        batches = []
+        try:
+            with open(self.filename, "rb") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if "ops" in record:
+                        batches.append([record["ops"], None])
+                    elif batches:
+                        batches[-1][1] = record["applied"]
+        except FileNotFoundError:
+            pass
+        return [tuple(batch) for batch in batches]
+
+    def truncate(self):
+        """Empty the log once everything in it is durable in the data files (a checkpoint)."""
+        with open(self.filename, "wb") as file:
+            file.flush()
+            os.fsync(file.fileno())